@@ -1,7 +1,21 @@
 from django.apps import AppConfig
+from django.db.models.signals import pre_migrate
+
+
+def create_extensions(using, **kwargs):
+    """Install the Postgres extensions our indexes depend on before migrating"""
+    from django.db import connections
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
 
 
 class BooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'books'
 
+    def ready(self):
+        pre_migrate.connect(create_extensions, sender=self)
+        from . import signals  # noqa: F401
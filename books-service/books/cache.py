@@ -0,0 +1,159 @@
+"""
+Two-tier read-through cache for catalog reads.
+
+Tier 1 is a bounded, per-process LRU with a short TTL; tier 2 is the shared
+Django cache (Redis in deployed environments). Writes invalidate both tiers
+through model signals (see books.signals). Other processes only see an
+invalidation once their local entry expires, so LOCAL_TTL bounds staleness.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU with per-entry expiry"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TwoTierCache:
+    """Read-through cache: local LRU -> shared cache -> loader"""
+
+    def __init__(self, prefix, alias='default', local_maxsize=1024, local_ttl=5, ttl=300):
+        self.prefix = prefix
+        self.alias = alias
+        self.ttl = ttl
+        self.local = LRUCache(local_maxsize, local_ttl)
+        self._counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0, 'shared_errors': 0}
+        self._counter_lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        return f'{self.prefix}:{key}'
+
+    def _count(self, name):
+        with self._counter_lock:
+            self._counters[name] += 1
+
+    def _shared_call(self, method, *args):
+        """Call the shared tier, degrading to a miss if it is unavailable"""
+        try:
+            return getattr(self.shared, method)(*args)
+        except Exception:
+            self._count('shared_errors')
+            logger.warning('Shared cache %s failed', method, exc_info=True)
+            return None
+
+    def get_or_set(self, key, loader):
+        key = self._key(key)
+        value = self.local.get(key)
+        if value is not _MISSING:
+            self._count('local_hits')
+            return value
+
+        value = self._shared_call('get', key)
+        if value is not None:
+            self._count('shared_hits')
+            self.local.set(key, value)
+            return value
+
+        self._count('misses')
+        value = loader()
+        self._shared_call('set', key, value, self.ttl)
+        self.local.set(key, value)
+        return value
+
+    def delete(self, *keys):
+        keys = [self._key(key) for key in keys]
+        for key in keys:
+            self.local.delete(key)
+        self._shared_call('delete_many', keys)
+
+    def generation(self, namespace):
+        """Current generation counter for a namespace of list entries"""
+        key = self._key(f'gen:{namespace}')
+        value = self.local.get(key)
+        if value is _MISSING:
+            # Generations never expire in the shared tier, so a counter cannot
+            # fall back to a value that older list entries were stored under
+            self._shared_call('add', key, 0, None)
+            value = self._shared_call('get', key) or 0
+            self.local.set(key, value)
+        return value
+
+    def bump_generation(self, namespace):
+        """Invalidate every list entry in a namespace at once"""
+        key = self._key(f'gen:{namespace}')
+        self.local.delete(key)
+        self._shared_call('add', key, 0, None)
+        if self._shared_call('incr', key) is None:
+            # Shared tier unavailable: fall back to a fresh local generation
+            self.local.set(key, time.time_ns())
+
+    def stats(self):
+        with self._counter_lock:
+            counters = dict(self._counters)
+        lookups = counters['local_hits'] + counters['shared_hits'] + counters['misses']
+        hits = counters['local_hits'] + counters['shared_hits']
+        counters.update({
+            'local_size': len(self.local),
+            'local_maxsize': self.local.maxsize,
+            'hit_ratio': round(hits / lookups, 4) if lookups else None,
+        })
+        return counters
+
+
+_config = getattr(settings, 'BOOKS_CACHE', {})
+
+catalog_cache = TwoTierCache(
+    'catalog',
+    local_maxsize=_config.get('LOCAL_MAXSIZE', 1024),
+    local_ttl=_config.get('LOCAL_TTL', 5),
+    ttl=_config.get('TTL', 300),
+)
@@ -0,0 +1,43 @@
+"""
+Streaming catalog export.
+
+Rows come from a server-side cursor (QuerySet.iterator) and are rendered
+one at a time, so memory stays flat regardless of catalog size.
+"""
+import csv
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import BookRowSerializer
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+CSV_FIELDS = ('id', 'title', 'author', 'description', 'price', 'category',
+              'category_name', 'stock', 'isbn', 'published_date',
+              'average_rating', 'review_count', 'created_at', 'updated_at')
+
+
+class Echo:
+    """File-like object whose write() just returns the value for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def _books(queryset):
+    rows = queryset.values(*BookRowSerializer.values_fields).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    return BookRowSerializer(rows).stream()
+
+
+def ndjson_stream(queryset):
+    encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for book in _books(queryset):
+        yield encoder.encode(book) + '\n'
+
+
+def csv_stream(queryset):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_FIELDS)
+    for book in _books(queryset):
+        yield writer.writerow([book.get(field) for field in CSV_FIELDS])
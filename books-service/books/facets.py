@@ -0,0 +1,196 @@
+"""
+Facet counts for the browse sidebar.
+
+BookFacetCount and AuthorFacetCount hold book counts per facet cell and are
+adjusted by +/-1 deltas on every Book write (see books.signals), so a facet
+request aggregates a few hundred small rows instead of scanning books.
+Bulk paths that bypass model signals either apply their own deltas (stock
+reservations) or finish with rebuild() (catalog import).
+"""
+from bisect import bisect_right
+from collections import Counter
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    BooleanField, Case, CharField, Count, ExpressionWrapper, F, IntegerField, Q, Sum, Value, When
+)
+from django.db.models.functions import Cast, Coalesce
+
+from .models import AuthorFacetCount, Book, BookFacetCount
+
+
+# Upper bounds (exclusive) of each price band; the last band is open-ended
+PRICE_BAND_BOUNDS = (Decimal('10'), Decimal('20'), Decimal('50'), Decimal('100'))
+PRICE_BAND_LABELS = ('Under 10', '10 - 20', '20 - 50', '50 - 100', '100 and over')
+
+TOP_AUTHORS = 10
+UNCATEGORISED = 0
+
+
+def price_band(price):
+    return bisect_right(PRICE_BAND_BOUNDS, Decimal(price))
+
+
+def book_cells(category_id, price, stock, author):
+    """Facet cells a book with these values is counted in"""
+    category_id = category_id or UNCATEGORISED
+    return (
+        ('book', (category_id, price_band(price), stock > 0)),
+        ('author', (category_id, author)),
+    )
+
+
+def book_state(values):
+    """Facet-relevant values of a book, from an instance or a values() row"""
+    if isinstance(values, Book):
+        return (values.category_id, values.price, values.stock, values.author)
+    return (values['category_id'], values['price'], values['stock'], values['author'])
+
+
+def _increment(model, lookup, delta):
+    updated = model.objects.filter(**lookup).update(count=F('count') + delta)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(count=delta, **lookup)
+    except IntegrityError:
+        # Created concurrently since the UPDATE above
+        model.objects.filter(**lookup).update(count=F('count') + delta)
+
+
+def apply_deltas(deltas):
+    """Apply a Counter of {cell: delta} produced by book_cells()"""
+    with transaction.atomic():
+        for (kind, key), delta in sorted(deltas.items(), key=str):
+            if not delta:
+                continue
+            if kind == 'book':
+                category_id, band, in_stock = key
+                _increment(BookFacetCount, {
+                    'category_id': category_id, 'price_band': band, 'in_stock': in_stock,
+                }, delta)
+            else:
+                category_id, author = key
+                _increment(AuthorFacetCount, {'category_id': category_id, 'author': author}, delta)
+
+
+def book_changed(old_state, new_state):
+    """Move one book between cells; either state may be None (create/delete)"""
+    if old_state == new_state:
+        return
+    deltas = Counter()
+    if old_state is not None:
+        deltas.subtract(dict.fromkeys(book_cells(*old_state), 1))
+    if new_state is not None:
+        deltas.update(dict.fromkeys(book_cells(*new_state), 1))
+    apply_deltas(deltas)
+
+
+def stock_changed(rows):
+    """Apply in-stock transitions for (category_id, price, old_stock, new_stock) rows"""
+    deltas = Counter()
+    for category_id, price, old_stock, new_stock in rows:
+        if (old_stock > 0) != (new_stock > 0):
+            category_id = category_id or UNCATEGORISED
+            band = price_band(price)
+            deltas[('book', (category_id, band, old_stock > 0))] -= 1
+            deltas[('book', (category_id, band, new_stock > 0))] += 1
+    if deltas:
+        apply_deltas(deltas)
+
+
+def category_deleted(category_id):
+    """Fold a deleted category's cells into the uncategorised ones"""
+    deltas = Counter()
+    for cell in BookFacetCount.objects.filter(category_id=category_id):
+        deltas[('book', (UNCATEGORISED, cell.price_band, cell.in_stock))] += cell.count
+    for cell in AuthorFacetCount.objects.filter(category_id=category_id):
+        deltas[('author', (UNCATEGORISED, cell.author))] += cell.count
+    with transaction.atomic():
+        apply_deltas(deltas)
+        BookFacetCount.objects.filter(category_id=category_id).delete()
+        AuthorFacetCount.objects.filter(category_id=category_id).delete()
+
+
+def _band_expression():
+    whens = [When(price__lt=bound, then=Value(band)) for band, bound in enumerate(PRICE_BAND_BOUNDS)]
+    return Case(*whens, default=Value(len(PRICE_BAND_BOUNDS)), output_field=IntegerField())
+
+
+def rebuild(batch_size=5000):
+    """Recompute every facet count from the books table"""
+    books = Book.objects.order_by().annotate(cat=Coalesce('category_id', Value(UNCATEGORISED)))
+    cells = books.annotate(
+        band=_band_expression(),
+        stocked=ExpressionWrapper(Q(stock__gt=0), output_field=BooleanField()),
+    ).values('cat', 'band', 'stocked').annotate(total=Count('pk'))
+    authors = books.values('cat', 'author').annotate(total=Count('pk'))
+
+    with transaction.atomic():
+        BookFacetCount.objects.all().delete()
+        AuthorFacetCount.objects.all().delete()
+        BookFacetCount.objects.bulk_create([
+            BookFacetCount(category_id=row['cat'], price_band=row['band'],
+                           in_stock=row['stocked'], count=row['total'])
+            for row in cells
+        ])
+        batch = []
+        for row in authors.iterator(chunk_size=batch_size):
+            batch.append(AuthorFacetCount(category_id=row['cat'], author=row['author'],
+                                          count=row['total']))
+            if len(batch) >= batch_size:
+                AuthorFacetCount.objects.bulk_create(batch)
+                batch = []
+        AuthorFacetCount.objects.bulk_create(batch)
+
+
+def facet_query(category_id=None, band=None, in_stock=None):
+    """Disjunctive facet counts for a filter set as one UNION ALL query.
+
+    Each facet is counted with every filter applied except its own, so the
+    sidebar keeps showing alternatives for the selected value. Author counts
+    are kept per category only, so they honour just the category filter.
+    """
+    filters = {
+        'category': Q(category_id=category_id) if category_id is not None else Q(),
+        'price_band': Q(price_band=band) if band is not None else Q(),
+        'in_stock': Q(in_stock=in_stock) if in_stock is not None else Q(),
+    }
+
+    def grouped(facet, column):
+        q = Q(count__gt=0)
+        for name, condition in filters.items():
+            if name != facet:
+                q &= condition
+        # UNION needs one column type, so every facet value travels as text
+        return BookFacetCount.objects.filter(q).order_by().values(column).annotate(
+            facet=Value(facet, output_field=CharField()),
+            value=Cast(column, CharField()),
+            total=Sum('count'),
+        ).values_list('facet', 'value', 'total')
+
+    authors = AuthorFacetCount.objects.filter(count__gt=0)
+    if category_id is not None:
+        authors = authors.filter(category_id=category_id)
+    top_authors = authors.order_by().values('author').annotate(
+        facet=Value('author', output_field=CharField()),
+        value=F('author'),
+        total=Sum('count'),
+    ).order_by('-total', 'author').values_list('facet', 'value', 'total')[:TOP_AUTHORS]
+
+    return grouped('category', 'category_id').union(
+        grouped('price_band', 'price_band'),
+        grouped('in_stock', 'in_stock'),
+        top_authors,
+        all=True,
+    )
+
+
+def facet_counts(category_id=None, band=None, in_stock=None):
+    """Run facet_query(); returns {facet: {value: count}} with values as text"""
+    counts = {'category': {}, 'price_band': {}, 'in_stock': {}, 'author': {}}
+    for facet, value, total in facet_query(category_id, band, in_stock):
+        counts[facet][value] = total
+    return counts
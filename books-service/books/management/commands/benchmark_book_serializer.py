@@ -0,0 +1,88 @@
+import datetime
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from books.models import Book, Category
+from books.serializers import BookRowSerializer, BookSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare BookSerializer with the BookRowSerializer fast path (output and speed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000,
+                            help='Number of books to serialize per run')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--synthetic', action='store_true',
+                            help='Use in-memory books instead of reading the database')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        renderer = JSONRenderer()
+
+        if options['synthetic']:
+            load_instances, load_rows = self._synthetic(rows)
+        else:
+            queryset = Book.objects.select_related('category').order_by('-created_at', 'id')[:rows]
+            values = Book.objects.order_by('-created_at', 'id').values(
+                *BookRowSerializer.values_fields
+            )[:rows]
+            load_instances = lambda: list(queryset.all())  # noqa: E731
+            load_rows = lambda: list(values.all())  # noqa: E731
+
+        instances_json = renderer.render(BookSerializer(load_instances(), many=True).data)
+        rows_json = renderer.render(BookRowSerializer(load_rows()).data)
+        if instances_json != rows_json:
+            raise CommandError('BookRowSerializer output differs from BookSerializer')
+
+        results = {
+            'BookSerializer': self._time(
+                lambda: renderer.render(BookSerializer(load_instances(), many=True).data), repeat),
+            'BookRowSerializer': self._time(
+                lambda: renderer.render(BookRowSerializer(load_rows()).data), repeat),
+        }
+
+        count = len(load_rows())
+        self.stdout.write(f'{count} books x {repeat} runs, output identical ({len(rows_json)} bytes)')
+        for name, seconds in results.items():
+            self.stdout.write(f'  {name:<18} {seconds * 1000:8.2f} ms/run')
+        speedup = results['BookSerializer'] / results['BookRowSerializer']
+        self.stdout.write(self.style.SUCCESS(f'Fast path is {speedup:.1f}x faster'))
+
+    def _time(self, func, repeat):
+        func()  # warm up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat
+
+    def _synthetic(self, count):
+        now = timezone.now()
+        categories = [Category(id=i, name=f'Category {i}') for i in range(1, 11)]
+        instances, rows = [], []
+        for i in range(1, count + 1):
+            category = categories[i % 11 - 1] if i % 11 else None
+            book = Book(
+                id=i, title=f'Book {i}', author=f'Author {i % 97}',
+                description='A synthetic book used for benchmarking.',
+                price=Decimal(f'{i % 50 + 0.99:.2f}'), category=category, stock=i % 13,
+                isbn=f'{9780000000000 + i}', published_date=datetime.date(2000, 1, 1),
+                average_rating=Decimal(f'{i % 5}.{i % 100:02d}'), review_count=i % 40,
+                created_at=now, updated_at=now,
+            )
+            instances.append(book)
+            rows.append({
+                'id': book.id, 'title': book.title, 'author': book.author,
+                'description': book.description, 'price': book.price,
+                'category': category.id if category else None,
+                'category__name': category.name if category else None,
+                'stock': book.stock, 'isbn': book.isbn,
+                'published_date': book.published_date,
+                'average_rating': book.average_rating, 'review_count': book.review_count,
+                'created_at': book.created_at, 'updated_at': book.updated_at,
+            })
+        return (lambda: instances), (lambda: rows)
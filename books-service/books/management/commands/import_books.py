@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+import sys
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from books import facets
+from books.models import Book, Category, book_search_vector
+from books.signals import invalidate_books
+
+
+COLUMNS = ('title', 'author', 'description', 'price', 'category_id', 'stock',
+           'isbn', 'published_date')
+
+STAGING_TABLE = 'books_import_staging'
+
+
+class RowError(ValueError):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Bulk import books from CSV or JSONL via COPY, upserting on isbn'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin")
+        parser.add_argument('--format', choices=['csv', 'jsonl'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Rows per COPY/upsert transaction; bounds memory use')
+        parser.add_argument('--max-errors', type=int, default=100,
+                            help='Abort after this many invalid rows')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or self._guess_format(path)
+        self.batch_size = options['batch_size']
+        self.max_errors = options['max_errors']
+        self.categories = dict(Category.objects.values_list('name', 'id'))
+        self.errors = 0
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            records = self._read_csv(stream) if input_format == 'csv' else self._read_jsonl(stream)
+            self._create_staging_table()
+            self._import(records)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+    def _guess_format(self, path):
+        if path.endswith('.csv'):
+            return 'csv'
+        if path.endswith(('.jsonl', '.ndjson')):
+            return 'jsonl'
+        raise CommandError('Cannot infer input format; pass --format csv|jsonl')
+
+    def _read_csv(self, stream):
+        for line_number, record in enumerate(csv.DictReader(stream), start=2):
+            yield line_number, record
+
+    def _read_jsonl(self, stream):
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_number, exc
+
+    def _import(self, records):
+        started = time.perf_counter()
+        total_inserted = total_updated = 0
+        batch = []
+        try:
+            for line_number, record in records:
+                try:
+                    if isinstance(record, Exception):
+                        raise RowError(str(record))
+                    if not isinstance(record, dict):
+                        raise RowError('expected an object per line')
+                    batch.append(self._clean(record))
+                except RowError as exc:
+                    self._row_error(line_number, exc)
+                    continue
+                if len(batch) >= self.batch_size:
+                    inserted, updated = self._flush(batch)
+                    total_inserted += inserted
+                    total_updated += updated
+                    batch = []
+                    self._progress(total_inserted + total_updated, started)
+            if batch:
+                inserted, updated = self._flush(batch)
+                total_inserted += inserted
+                total_updated += updated
+        finally:
+            # Upserts bypass model signals, so recount facets once at the end,
+            # also when an abort leaves earlier batches committed
+            facets.rebuild()
+
+        elapsed = time.perf_counter() - started
+        total = total_inserted + total_updated
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} books ({total_inserted} new, {total_updated} updated, '
+            f'{self.errors} skipped) in {elapsed:.1f}s - {total / elapsed if elapsed else 0:.0f} rows/sec'
+        ))
+
+    def _progress(self, total, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'  {total} rows, {total / elapsed if elapsed else 0:.0f} rows/sec')
+
+    def _row_error(self, line_number, exc):
+        self.errors += 1
+        self.stderr.write(f'Line {line_number}: {exc}')
+        if self.errors > self.max_errors:
+            raise CommandError(f'Aborting after {self.errors} invalid rows')
+
+    def _clean(self, record):
+        title = (record.get('title') or '').strip()
+        author = (record.get('author') or '').strip()
+        if not title or not author:
+            raise RowError('title and author are required')
+        raw_price = record.get('price')
+        try:
+            price = Decimal(str('' if raw_price is None else raw_price).strip()).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise RowError(f"invalid price {record.get('price')!r}")
+        if not price.is_finite():
+            raise RowError(f"invalid price {record.get('price')!r}")
+        if not Decimal(0) <= price < Decimal(10) ** 8:
+            raise RowError(f'price out of range {price}')
+        raw_stock = record.get('stock')
+        try:
+            stock = 0 if raw_stock is None or raw_stock == '' else int(raw_stock)
+        except (TypeError, ValueError):
+            raise RowError(f"invalid stock {raw_stock!r}")
+        if stock < 0:
+            raise RowError(f'stock out of range {stock}')
+        isbn = str(record.get('isbn') or '').replace('-', '').replace(' ', '') or None
+        if isbn and len(isbn) > 13:
+            raise RowError(f'invalid isbn {isbn!r}')
+        published_date = record.get('published_date') or None
+        if published_date:
+            try:
+                published_date = date.fromisoformat(str(published_date).strip())
+            except ValueError:
+                raise RowError(f'invalid published_date {published_date!r}')
+        category = str(record.get('category') or '').strip()[:100]
+        return {
+            'title': title[:200],
+            'author': author[:200],
+            'description': record.get('description') or None,
+            'price': price,
+            'category': category or None,
+            'stock': stock,
+            'isbn': isbn,
+            'published_date': published_date,
+        }
+
+    def _resolve_categories(self, batch):
+        missing = {row['category'] for row in batch if row['category']} - set(self.categories)
+        if missing:
+            Category.objects.bulk_create(
+                [Category(name=name) for name in missing], ignore_conflicts=True
+            )
+            self.categories.update(
+                Category.objects.filter(name__in=missing).values_list('name', 'id')
+            )
+
+    def _create_staging_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} ('
+                'title varchar(200), author varchar(200), description text, '
+                'price numeric(10, 2), category_id bigint, stock integer, '
+                'isbn varchar(13), published_date date'
+                ') ON COMMIT DELETE ROWS'
+            )
+
+    def _flush(self, batch):
+        """COPY one batch into staging and upsert it into the books table"""
+        self._resolve_categories(batch)
+
+        # ON CONFLICT cannot touch a row twice per statement: last row wins
+        rows = list({row['isbn']: row for row in batch if row['isbn']}.values())
+        rows += [row for row in batch if not row['isbn']]
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([
+                row['title'], row['author'], row['description'], row['price'],
+                self.categories.get(row['category']), row['stock'], row['isbn'],
+                row['published_date'],
+            ])
+        buffer.seek(0)
+
+        table = connection.ops.quote_name(Book._meta.db_table)
+        columns = ', '.join(COLUMNS)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}, average_rating, review_count, created_at, updated_at) '
+                f'SELECT {columns}, 0, 0, now(), now() FROM {STAGING_TABLE} '
+                'ON CONFLICT (isbn) DO UPDATE SET '
+                'title = EXCLUDED.title, author = EXCLUDED.author, '
+                'description = EXCLUDED.description, price = EXCLUDED.price, '
+                'category_id = EXCLUDED.category_id, stock = EXCLUDED.stock, '
+                'published_date = EXCLUDED.published_date, updated_at = EXCLUDED.updated_at '
+                # xmax is 0 only for freshly inserted rows
+                'RETURNING id, (xmax = 0)'
+            )
+            results = cursor.fetchall()
+            book_ids = [book_id for book_id, _ in results]
+            Book.objects.filter(pk__in=book_ids).update(search_vector=book_search_vector())
+            transaction.on_commit(lambda: invalidate_books(*book_ids))
+
+        inserted = sum(1 for _, is_insert in results if is_insert)
+        return inserted, len(results) - inserted
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from books import facets
+from books.models import AuthorFacetCount, BookFacetCount
+
+
+class Command(BaseCommand):
+    help = 'Recompute the facet count tables from the books table'
+
+    def handle(self, *args, **options):
+        facets.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {BookFacetCount.objects.count()} facet cells and '
+            f'{AuthorFacetCount.objects.count()} author cells'
+        ))
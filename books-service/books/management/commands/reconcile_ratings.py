@@ -0,0 +1,52 @@
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from books.models import Book
+from books.ratings import apply_rating_summaries, clear_rating_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute Book.average_rating/review_count in bulk from reviews-service'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        # Anything pushed after this point is newer and must not be overwritten
+        as_of = timezone.now()
+        after = 0
+        updated = cleared = 0
+        while True:
+            summaries = self._fetch(after, batch_size)
+            if not summaries:
+                break
+            last = summaries[-1]['book_id']
+            updated += len(apply_rating_summaries(summaries, as_of))
+            # Books in this id range that reviews-service no longer has reviews for
+            cleared += len(clear_rating_summaries(
+                Book.objects.filter(pk__gt=after, pk__lte=last).exclude(
+                    pk__in=[summary['book_id'] for summary in summaries]
+                ), as_of))
+            after = last
+            if len(summaries) < batch_size:
+                break
+        cleared += len(clear_rating_summaries(Book.objects.filter(pk__gt=after), as_of))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Reconciled ratings: {updated} books updated, {cleared} reset to no reviews'
+        ))
+
+    def _fetch(self, after, limit):
+        try:
+            response = requests.get(
+                f"{settings.REVIEWS_SERVICE_URL}/api/reviews/rating_summaries/",
+                params={'after': after, 'limit': limit},
+                timeout=30
+            )
+            response.raise_for_status()
+        except requests.RequestException as exc:
+            raise CommandError(f'Unable to fetch rating summaries: {exc}')
+        return response.json()['results']
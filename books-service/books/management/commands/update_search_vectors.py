@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from books.models import Book, book_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Recompute Book.search_vector in batches (backfill after bulk writes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--only-missing', action='store_true',
+                            help='Only rows whose search vector is NULL')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Book.objects.order_by('pk')
+        if options['only_missing']:
+            queryset = queryset.filter(search_vector__isnull=True)
+
+        last_pk = 0
+        updated = 0
+        while True:
+            pks = list(queryset.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            updated += Book.objects.filter(pk__in=pks).update(search_vector=book_search_vector())
+            last_pk = pks[-1]
+
+        self.stdout.write(self.style.SUCCESS(f'Updated search vectors for {updated} books'))
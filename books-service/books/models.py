@@ -1,11 +1,26 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 
 
+SEARCH_CONFIG = 'english'
+
+
+def book_search_vector():
+    """Weighted search document for a book: title > author > description"""
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG) +
+        SearchVector('author', weight='B', config=SEARCH_CONFIG) +
+        SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
 class Category(models.Model):
     """Book category model"""
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -24,12 +39,67 @@ class Book(models.Model):
     stock = models.IntegerField(default=0)
     isbn = models.CharField(max_length=13, unique=True, blank=True, null=True)
     published_date = models.DateField(blank=True, null=True)
+    # Denormalized from reviews-service (see books.ratings); eventually consistent
+    average_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    review_count = models.IntegerField(default=0)
+    ratings_updated_at = models.DateTimeField(blank=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by books.signals; see book_search_vector()
+    search_vector = SearchVectorField(null=True, editable=False)
 
     def __str__(self):
         return f"{self.title} by {self.author}"
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination (see books.pagination)
+            models.Index(fields=['-created_at', 'id'], name='book_created_at_id_idx'),
+            models.Index(fields=['category', '-created_at', 'id'], name='book_category_created_idx'),
+            # Incremental catalog export (updated_since)
+            models.Index(fields=['updated_at', 'id'], name='book_updated_at_id_idx'),
+            GinIndex(fields=['search_vector'], name='book_search_vector_gin'),
+            # Trigram indexes (pg_trgm) back the typeahead/suggest endpoint
+            GinIndex(fields=['title'], name='book_title_trgm', opclasses=['gin_trgm_ops']),
+            GinIndex(fields=['author'], name='book_author_trgm', opclasses=['gin_trgm_ops']),
+        ]
+
+
+class BookFacetCount(models.Model):
+    """Precomputed book counts per (category, price band, in-stock) cell.
+
+    Kept current incrementally by books.facets; category_id 0 means
+    uncategorised. Rebuild with `manage.py rebuild_facet_counts`.
+    """
+    category_id = models.BigIntegerField()
+    price_band = models.SmallIntegerField()
+    in_stock = models.BooleanField()
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Category {self.category_id} / band {self.price_band} / in stock {self.in_stock}: {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category_id', 'price_band', 'in_stock'],
+                                    name='book_facet_cell_unique'),
+        ]
 
+
+class AuthorFacetCount(models.Model):
+    """Precomputed book counts per (category, author); category_id 0 means uncategorised"""
+    category_id = models.BigIntegerField()
+    author = models.CharField(max_length=200)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Category {self.category_id} / {self.author}: {self.count}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['category_id', 'author'], name='author_facet_cell_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['category_id', '-count'], name='author_facet_top_idx'),
+        ]
@@ -0,0 +1,14 @@
+from rest_framework.pagination import CursorPagination
+
+
+class BookCursorPagination(CursorPagination):
+    """Keyset pagination on (-created_at, id), served by book_created_at_id_idx"""
+    ordering = ('-created_at', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class BookSearchCursorPagination(BookCursorPagination):
+    """Keyset pagination for ranked search results; expects a `rank` annotation"""
+    ordering = ('-rank', 'id')
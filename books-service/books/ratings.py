@@ -0,0 +1,63 @@
+"""
+Denormalized rating summaries pushed by reviews-service.
+
+Summaries are absolute (average, count) values stamped with the time they
+were computed, so replays and out-of-order deliveries are harmless: a row
+only accepts a summary newer than the one it already holds. A stamp further
+ahead than BOOK_RATINGS_MAX_CLOCK_SKEW (left by a clock running ahead) does
+not count, so such rows can be corrected again.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Book
+from .signals import invalidate_books
+
+
+def _latest_valid_stamp():
+    return timezone.now() + timedelta(seconds=settings.BOOK_RATINGS_MAX_CLOCK_SKEW)
+
+
+def apply_rating_summaries(summaries, as_of):
+    """Write many summaries in one UPDATE ... FROM (VALUES ...); returns updated book ids"""
+    if not summaries:
+        return []
+    table = connection.ops.quote_name(Book._meta.db_table)
+    values = ', '.join(['(%s::bigint, %s::numeric(3, 2), %s::integer)'] * len(summaries))
+    sql = (
+        f'UPDATE {table} AS b SET average_rating = r.average_rating, '
+        f'review_count = r.review_count, ratings_updated_at = %s, updated_at = %s '
+        f'FROM (VALUES {values}) AS r(id, average_rating, review_count) '
+        f'WHERE b.id = r.id AND (b.ratings_updated_at IS NULL OR b.ratings_updated_at <= %s '
+        f'OR b.ratings_updated_at > %s) '
+        f'RETURNING b.id'
+    )
+    params = [as_of, timezone.now()]
+    for summary in summaries:
+        params.extend([summary['book_id'], summary['average_rating'], summary['review_count']])
+    params.extend([as_of, _latest_valid_stamp()])
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        book_ids = [row[0] for row in cursor.fetchall()]
+        if book_ids:
+            transaction.on_commit(lambda: invalidate_books(*book_ids))
+    return book_ids
+
+
+def clear_rating_summaries(queryset, as_of):
+    """Reset books that no longer have any reviews"""
+    book_ids = list(queryset.filter(
+        Q(ratings_updated_at__isnull=True) | Q(ratings_updated_at__lte=as_of)
+        | Q(ratings_updated_at__gt=_latest_valid_stamp()),
+        review_count__gt=0,
+    ).values_list('pk', flat=True))
+    if book_ids:
+        Book.objects.filter(pk__in=book_ids).update(
+            average_rating=0, review_count=0, ratings_updated_at=as_of, updated_at=timezone.now()
+        )
+        invalidate_books(*book_ids)
+    return book_ids
@@ -1,4 +1,10 @@
-from rest_framework import serializers
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from .models import Book, Category
 
 
@@ -16,8 +22,8 @@ class BookSerializer(serializers.ModelSerializer):
         model = Book
         fields = ('id', 'title', 'author', 'description', 'price', 'category', 
                   'category_name', 'stock', 'isbn', 'published_date', 
-                  'created_at', 'updated_at')
-        read_only_fields = ('id', 'created_at', 'updated_at')
+                  'average_rating', 'review_count', 'created_at', 'updated_at')
+        read_only_fields = ('id', 'average_rating', 'review_count', 'created_at', 'updated_at')
 
 
 class BookCreateUpdateSerializer(serializers.ModelSerializer):
@@ -26,3 +32,124 @@ class BookCreateUpdateSerializer(serializers.ModelSerializer):
         fields = ('title', 'author', 'description', 'price', 'category', 
                   'stock', 'isbn', 'published_date')
 
+
+class BookBulkLookupSerializer(serializers.Serializer):
+    """Request body for BookViewSet.bulk: up to MAX_ITEMS ids and/or ISBNs"""
+    MAX_ITEMS = 500
+
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1),
+                                required=False, default=list)
+    isbns = serializers.ListField(child=serializers.CharField(max_length=17),
+                                  required=False, default=list)
+
+    def validate_isbns(self, value):
+        # Accept hyphenated/spaced forms; ISBNs are stored bare
+        return [isbn.replace('-', '').replace(' ', '') for isbn in value]
+
+    def validate(self, attrs):
+        total = len(attrs['ids']) + len(attrs['isbns'])
+        if not total:
+            raise serializers.ValidationError('Provide at least one of ids or isbns')
+        if total > self.MAX_ITEMS:
+            raise serializers.ValidationError(f'At most {self.MAX_ITEMS} ids and isbns per request')
+        return attrs
+
+
+class StockItemSerializer(serializers.Serializer):
+    book_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class StockReservationSerializer(serializers.Serializer):
+    """Request body for BookViewSet.reserve / release"""
+    MAX_ITEMS = 500
+
+    items = StockItemSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+    all_or_nothing = serializers.BooleanField(default=True)
+
+
+class RatingSummarySerializer(serializers.Serializer):
+    book_id = serializers.IntegerField(min_value=1)
+    average_rating = serializers.DecimalField(max_digits=3, decimal_places=2, min_value=0, max_value=5)
+    review_count = serializers.IntegerField(min_value=0)
+
+
+class RatingSummaryBatchSerializer(serializers.Serializer):
+    """Rating summaries pushed by reviews-service, computed as of `as_of`"""
+    MAX_ITEMS = 1000
+
+    as_of = serializers.DateTimeField()
+    ratings = RatingSummarySerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+
+    def validate_as_of(self, value):
+        # A future stamp would make the books refuse every later summary
+        if value > timezone.now() + timedelta(seconds=settings.BOOK_RATINGS_MAX_CLOCK_SKEW):
+            raise serializers.ValidationError('as_of is in the future')
+        return value
+
+class BookRowSerializer:
+    """Fast read path for list endpoints.
+
+    Renders rows from ``queryset.values(*BookRowSerializer.values_fields)``
+    into exactly the representation BookSerializer produces, without
+    building model instances or walking DRF fields per row. Formatting
+    shortcuts cover the common case (2dp decimals, aware datetimes, ISO
+    output) and defer to the equivalent DRF field for anything else.
+    """
+    values_fields = ('id', 'title', 'author', 'description', 'price', 'category',
+                     'category__name', 'stock', 'isbn', 'published_date',
+                     'average_rating', 'review_count', 'created_at', 'updated_at')
+
+    _price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    _rating = serializers.DecimalField(max_digits=3, decimal_places=2)
+    _datetime = serializers.DateTimeField()
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def _format_decimal(self, value, field):
+        if value.as_tuple().exponent == -field.decimal_places:
+            return format(value, 'f')
+        return field.to_representation(value)
+
+    def _format_datetime(self, value, tz):
+        if value is None or timezone.is_naive(value):
+            return self._datetime.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    def to_representation(self, row, tz):
+        data = {
+            'id': row['id'],
+            'title': row['title'],
+            'author': row['author'],
+            'description': row['description'],
+            'price': self._format_decimal(row['price'], self._price),
+            'category': row['category'],
+        }
+        # BookSerializer omits category_name (rather than nulling it) for
+        # books without a category
+        if row['category'] is not None:
+            data['category_name'] = row['category__name']
+        data['stock'] = row['stock']
+        data['isbn'] = row['isbn']
+        data['published_date'] = row['published_date'].isoformat() if row['published_date'] else None
+        data['average_rating'] = self._format_decimal(row['average_rating'], self._rating)
+        data['review_count'] = row['review_count']
+        data['created_at'] = self._format_datetime(row['created_at'], tz)
+        data['updated_at'] = self._format_datetime(row['updated_at'], tz)
+        return data
+
+    def stream(self):
+        """Lazily render rows, e.g. from a server-side cursor"""
+        if not (api_settings.COERCE_DECIMAL_TO_STRING and api_settings.DATETIME_FORMAT == ISO_8601):
+            raise ImproperlyConfigured('BookRowSerializer only supports the default DRF output formats')
+        tz = timezone.get_current_timezone()
+        for row in self.rows:
+            yield self.to_representation(row, tz)
+
+    @property
+    def data(self):
+        return list(self.stream())
@@ -0,0 +1,77 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from . import facets
+from .cache import catalog_cache
+from .models import Book, Category, book_search_vector
+
+
+SEARCH_FIELDS = {'title', 'author', 'description'}
+
+
+@receiver(post_save, sender=Book)
+def update_search_vector(sender, instance, update_fields=None, **kwargs):
+    """Recompute the stored search vector when searchable text changes"""
+    if update_fields is not None and not SEARCH_FIELDS.intersection(update_fields):
+        return
+    # queryset.update() does not fire post_save, so this cannot recurse
+    Book.objects.filter(pk=instance.pk).update(search_vector=book_search_vector())
+
+
+def invalidate_books(*book_ids):
+    """Drop cached book details and every cached book list"""
+    if book_ids:
+        catalog_cache.delete(*(f'book:{book_id}' for book_id in book_ids))
+    catalog_cache.bump_generation('book')
+
+
+# Invalidation waits for the commit: a read between the write and the commit
+# would otherwise cache the old row again for the full TTL
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_cache(sender, instance, **kwargs):
+    book_id = instance.pk
+    transaction.on_commit(lambda: invalidate_books(book_id))
+
+
+def _invalidate_category(category_id, book_ids):
+    invalidate_books(*book_ids)
+    catalog_cache.delete(f'category:{category_id}')
+    catalog_cache.bump_generation('category')
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    # Book payloads embed category_name, and deleting a category nulls the
+    # FK with a bulk UPDATE, so find those books while they still can be
+    category_id = instance.pk
+    book_ids = list(Book.objects.filter(category_id=category_id).values_list('pk', flat=True))
+    transaction.on_commit(lambda: _invalidate_category(category_id, book_ids))
+
+
+@receiver(pre_save, sender=Book)
+def remember_facet_state(sender, instance, **kwargs):
+    old = None
+    if instance.pk:
+        old = Book.objects.filter(pk=instance.pk).values(
+            'category_id', 'price', 'stock', 'author'
+        ).first()
+    instance._facet_state = facets.book_state(old) if old else None
+
+
+@receiver(post_save, sender=Book)
+def update_facet_counts(sender, instance, **kwargs):
+    facets.book_changed(getattr(instance, '_facet_state', None), facets.book_state(instance))
+    instance._facet_state = facets.book_state(instance)
+
+
+@receiver(post_delete, sender=Book)
+def remove_facet_counts(sender, instance, **kwargs):
+    facets.book_changed(facets.book_state(instance), None)
+
+
+@receiver(pre_delete, sender=Category)
+def fold_category_facets(sender, instance, **kwargs):
+    facets.category_deleted(instance.pk)
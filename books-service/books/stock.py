@@ -0,0 +1,110 @@
+"""
+Atomic stock reservation and release.
+
+Each operation is one conditional UPDATE ... FROM (VALUES ...) RETURNING
+statement covering every book in the request, so concurrent checkouts only
+contend on the rows they touch and no read-then-write round trip is needed.
+The rows are locked in book id order first, so two requests touching the
+same books cannot deadlock.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import facets
+from .models import Book
+from .signals import invalidate_books
+
+
+class ReservationFailed(Exception):
+    """Raised inside the transaction to roll back an all-or-nothing reservation"""
+
+
+def _quantities(items):
+    """Merge duplicate book ids into a single {book_id: quantity} map"""
+    quantities = Counter()
+    for item in items:
+        quantities[item['book_id']] += item['quantity']
+    return dict(quantities)
+
+
+def _apply(quantities, sign, conditional):
+    """Run the batched stock UPDATE; returns {book_id: new_stock} for updated rows"""
+    table = connection.ops.quote_name(Book._meta.db_table)
+    values = ', '.join(['(%s::bigint, %s::integer)'] * len(quantities))
+    condition = ' AND b.stock >= r.qty' if conditional else ''
+    sql = (
+        f'UPDATE {table} AS b SET stock = b.stock {sign} r.qty, updated_at = %s '
+        f'FROM (VALUES {values}) AS r(id, qty) '
+        f'WHERE b.id = r.id{condition} '
+        f'RETURNING b.id, b.stock, b.category_id, b.price, r.qty'
+    )
+    params = [timezone.now()]
+    for book_id, quantity in sorted(quantities.items()):
+        params.extend([book_id, quantity])
+    id_params = ', '.join(['%s'] * len(quantities))
+    with connection.cursor() as cursor:
+        # The UPDATE's join order is up to the planner; take the locks in id order
+        cursor.execute(
+            f'SELECT id FROM {table} WHERE id IN ({id_params}) ORDER BY id FOR UPDATE',
+            sorted(quantities)
+        )
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    # Keep the in-stock facet in step, inside the same transaction
+    facets.stock_changed(
+        (category_id, price, stock + qty if sign == '-' else stock - qty, stock)
+        for _, stock, category_id, price, qty in rows
+    )
+    return {book_id: stock for book_id, stock, *_ in rows}
+
+
+def _results(quantities, updated, ok_key):
+    missing = set(quantities) - set(updated)
+    existing = set(Book.objects.filter(pk__in=missing).values_list('pk', flat=True)) if missing else set()
+    results = []
+    for book_id, quantity in quantities.items():
+        result = {'book_id': book_id, 'quantity': quantity, ok_key: book_id in updated}
+        if book_id in updated:
+            result['stock'] = updated[book_id]
+        else:
+            result['error'] = 'insufficient_stock' if book_id in existing else 'not_found'
+        results.append(result)
+    return results
+
+
+def reserve_stock(items, all_or_nothing=True):
+    """Decrement stock for every item whose book has enough left.
+
+    With all_or_nothing, any shortfall rolls the whole batch back and every
+    item is reported as not reserved.
+    """
+    quantities = _quantities(items)
+    updated = {}
+    try:
+        with transaction.atomic():
+            updated = _apply(quantities, '-', conditional=True)
+            if all_or_nothing and len(updated) != len(quantities):
+                raise ReservationFailed
+            if updated:
+                transaction.on_commit(lambda: invalidate_books(*updated))
+    except ReservationFailed:
+        results = _results(quantities, updated, 'reserved')
+        for result in results:
+            result['reserved'] = False
+            result.pop('stock', None)
+            result.setdefault('error', 'rolled_back')
+        return results
+    return _results(quantities, updated, 'reserved')
+
+
+def release_stock(items):
+    """Return previously reserved quantities to stock"""
+    quantities = _quantities(items)
+    with transaction.atomic():
+        updated = _apply(quantities, '+', conditional=False)
+        if updated:
+            transaction.on_commit(lambda: invalidate_books(*updated))
+    return _results(quantities, updated, 'released')
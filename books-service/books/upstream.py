@@ -0,0 +1,59 @@
+"""
+Concurrent calls to other services.
+
+Upstream GETs run on a shared thread pool so a view can start them, do its
+local work, and then collect the results. Each call is capped by one
+deadline, and a call that misses it is reported as failed, not raised, so
+the response can be served without that part.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import requests
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.UPSTREAM_MAX_WORKERS, thread_name_prefix='upstream'
+)
+
+
+def fetch_json(url, params=None, timeout=None):
+    response = requests.get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+class FanOut:
+    """Start upstream GETs now, collect them all by a shared deadline"""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout
+        self.futures = {}
+
+    def get(self, name, url, params=None):
+        # requests' read timeout is per socket read; the deadline caps the total
+        self.futures[name] = _executor.submit(fetch_json, url, params, self.timeout)
+
+    def cancel(self):
+        for future in self.futures.values():
+            future.cancel()
+
+    def results(self):
+        """Return ({name: data} for calls that succeeded, [names that failed])"""
+        data, failed = {}, []
+        for name, future in self.futures.items():
+            try:
+                data[name] = future.result(timeout=max(0, self.deadline - time.monotonic()))
+            except FutureTimeout:
+                future.cancel()
+                logger.warning('Upstream %s timed out after %.2fs', name, self.timeout)
+                failed.append(name)
+            except (requests.RequestException, ValueError) as exc:
+                logger.warning('Upstream %s failed: %s', name, exc)
+                failed.append(name)
+        return data, failed
@@ -1,35 +1,153 @@
+import hmac
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Q
-from .models import Book, Category
-from .serializers import BookSerializer, BookCreateUpdateSerializer, CategorySerializer
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import Count, F, FloatField, Max, Q
+from django.db.models.functions import Cast, Greatest
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .cache import catalog_cache
+from .conditional import ConditionalGetMixin
+from .export import csv_stream, ndjson_stream
+from .facets import PRICE_BAND_LABELS, facet_counts
+from .models import SEARCH_CONFIG, Book, Category
+from .pagination import BookCursorPagination, BookSearchCursorPagination
+from .serializers import (
+    BookBulkLookupSerializer, BookSerializer, BookCreateUpdateSerializer, BookRowSerializer,
+    CategorySerializer, RatingSummaryBatchSerializer, StockReservationSerializer
+)
+from .ratings import apply_rating_summaries
+from .stock import release_stock, reserve_stock
+from .upstream import FanOut
+
+
+EXPORT_FORMATS = {
+    'ndjson': (ndjson_stream, 'application/x-ndjson', 'books.ndjson'),
+    'csv': (csv_stream, 'text/csv', 'books.csv'),
+}
+
+SUGGEST_DEFAULT_LIMIT = 10
+SUGGEST_MAX_LIMIT = 25
+SUGGEST_MIN_QUERY_LENGTH = 2
+
+
+def _plain(data):
+    """Detach serializer output (ReturnDict/ReturnList) from its serializer"""
+    return dict(data) if isinstance(data, dict) else list(data)
+
+
+class CachedReadMixin:
+    """Serve retrieve and list responses through the two-tier catalog cache.
+
+    Detail entries are keyed by pk and dropped by books.signals on write;
+    list entries are keyed by URL under a generation that every write bumps.
+    """
+    cache_prefix = None
+
+    def cached_list_response(self, request, loader):
+        generation = catalog_cache.generation(self.cache_prefix)
+        key = f'{self.cache_prefix}-list:{generation}:{request.build_absolute_uri()}'
+        return Response(catalog_cache.get_or_set(key, lambda: _plain(loader().data)))
 
+    def retrieve(self, request, *args, **kwargs):
+        key = f'{self.cache_prefix}:{kwargs[self.lookup_field]}'
+        parent = super()
+        data = catalog_cache.get_or_set(
+            key, lambda: _plain(parent.retrieve(request, *args, **kwargs).data)
+        )
+        return Response(data)
 
-class CategoryViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        parent = super()
+        return self.cached_list_response(
+            request, lambda: parent.list(request, *args, **kwargs)
+        )
+
+
+class CategoryViewSet(ConditionalGetMixin, CachedReadMixin, viewsets.ModelViewSet):
     """ViewSet for Category CRUD operations"""
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    cache_prefix = 'category'
 
 
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ConditionalGetMixin, CachedReadMixin, viewsets.ModelViewSet):
     """ViewSet for Book CRUD operations"""
-    queryset = Book.objects.all()
+    queryset = Book.objects.select_related('category')
     serializer_class = BookSerializer
+    pagination_class = BookCursorPagination
+    cache_prefix = 'book'
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return BookCreateUpdateSerializer
         return BookSerializer
 
+    def paginated_rows_response(self, queryset, *extra_fields):
+        """Paginate and render books via the .values() fast path (one query, no N+1)"""
+        rows = queryset.values(*BookRowSerializer.values_fields, *extra_fields)
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(BookRowSerializer(page).data)
+
+    def list(self, request, *args, **kwargs):
+        books = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(
+            request, self.list_validators,
+            lambda: self.cached_list_response(request, lambda: self.paginated_rows_response(books))
+        )
+
+    @action(detail=True, methods=['get'])
+    def page(self, request, pk=None):
+        """Book, reviews and rating summary for the detail page in one round trip.
+
+        The reviews call runs while the book is loaded locally; if it misses
+        BOOK_PAGE_UPSTREAM_TIMEOUT the page is served without reviews and the
+        summary falls back to the book's denormalized rating.
+        """
+        upstream = FanOut(settings.BOOK_PAGE_UPSTREAM_TIMEOUT)
+        upstream.get('reviews', f"{settings.REVIEWS_SERVICE_URL}/api/reviews/by_book/",
+                     {'book_id': pk})
+        try:
+            book = catalog_cache.get_or_set(
+                f'{self.cache_prefix}:{pk}', lambda: _plain(self.get_serializer(self.get_object()).data)
+            )
+        except Http404:
+            upstream.cancel()
+            raise
+        data, degraded = upstream.results()
+
+        reviews = data.get('reviews')
+        if reviews is not None:
+            stats = {
+                'average_rating': reviews['average_rating'],
+                'total_reviews': reviews['total_reviews'],
+            }
+        else:
+            stats = {
+                'average_rating': float(book['average_rating']),
+                'total_reviews': book['review_count'],
+            }
+        return Response({
+            'book': book,
+            'reviews': reviews['reviews'] if reviews is not None else [],
+            'stats': stats,
+            'degraded': degraded,
+        })
+
     @action(detail=False, methods=['get'])
     def by_category(self, request):
         """Get books by category"""
         category_id = request.query_params.get('category_id')
         if category_id:
             books = Book.objects.filter(category_id=category_id)
-            serializer = self.get_serializer(books, many=True)
-            return Response(serializer.data)
+            return self.conditional_response(
+                request, self.list_validators,
+                lambda: self.cached_list_response(request, lambda: self.paginated_rows_response(books))
+            )
         return Response({'error': 'category_id parameter required'}, 
                        status=status.HTTP_400_BAD_REQUEST)
 
@@ -39,21 +157,201 @@ class BookViewSet(viewsets.ModelViewSet):
         author = request.query_params.get('author')
         if author:
             books = Book.objects.filter(author__icontains=author)
-            serializer = self.get_serializer(books, many=True)
-            return Response(serializer.data)
+            return self.paginated_rows_response(books)
         return Response({'error': 'author parameter required'}, 
                        status=status.HTTP_400_BAD_REQUEST)
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], pagination_class=BookSearchCursorPagination)
     def search(self, request):
-        """Search books by title or author"""
+        """Full-text search over title, author and description, ranked by relevance"""
         query = request.query_params.get('q')
         if query:
-            books = Book.objects.filter(
-                Q(title__icontains=query) | 
-                Q(author__icontains=query)
+            search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+            # ts_rank returns real; cast so cursor positions round-trip exactly
+            books = Book.objects.filter(search_vector=search_query).annotate(
+                rank=Cast(SearchRank(F('search_vector'), search_query), FloatField())
             )
-            serializer = self.get_serializer(books, many=True)
-            return Response(serializer.data)
+            return self.paginated_rows_response(books, 'rank')
         return Response({'error': 'q parameter required'}, 
                        status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Typeahead suggestions for book titles and authors (fuzzy, trigram-indexed)"""
+        query = (request.query_params.get('q') or '').strip()
+        if len(query) < SUGGEST_MIN_QUERY_LENGTH:
+            return Response(
+                {'error': f'q parameter of at least {SUGGEST_MIN_QUERY_LENGTH} characters required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(int(request.query_params.get('limit', SUGGEST_DEFAULT_LIMIT)), SUGGEST_MAX_LIMIT)
+        except ValueError:
+            return Response({'error': 'limit must be an integer'},
+                           status=status.HTTP_400_BAD_REQUEST)
+        limit = max(limit, 1)
+
+        # %> (word similarity) matches prefixes and typos within a word and is
+        # served by the gin_trgm_ops indexes on title and author
+        books = Book.objects.filter(
+            Q(title__trigram_word_similar=query) |
+            Q(author__trigram_word_similar=query)
+        ).annotate(
+            score=Greatest(
+                TrigramWordSimilarity(query, 'title'),
+                TrigramWordSimilarity(query, 'author'),
+            )
+        ).order_by('-score', 'title').values('id', 'title', 'author', 'score')[:limit]
+
+        authors = Book.objects.filter(
+            author__trigram_word_similar=query
+        ).values('author').annotate(
+            book_count=Count('id'),
+            score=Max(TrigramWordSimilarity(query, 'author')),
+        ).order_by('-score', 'author')[:limit]
+
+        return Response({
+            'query': query,
+            'books': [
+                {'id': b['id'], 'title': b['title'], 'author': b['author'],
+                 'score': round(b['score'], 3)}
+                for b in books
+            ],
+            'authors': [
+                {'name': a['author'], 'book_count': a['book_count'],
+                 'score': round(a['score'], 3)}
+                for a in authors
+            ],
+        })
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Look up many books by id and/or ISBN in a single query"""
+        serializer = BookBulkLookupSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        ids = serializer.validated_data['ids']
+        isbns = serializer.validated_data['isbns']
+
+        rows = Book.objects.filter(
+            Q(id__in=ids) | Q(isbn__in=isbns)
+        ).order_by().values(*BookRowSerializer.values_fields)
+        books = BookRowSerializer(rows).data
+        by_id = {book['id']: book for book in books}
+        by_isbn = {book['isbn']: book for book in books if book['isbn']}
+
+        # Missing books are reported explicitly as null entries
+        return Response({
+            'ids': {str(book_id): by_id.get(book_id) for book_id in ids},
+            'isbns': {isbn: by_isbn.get(isbn) for isbn in isbns},
+            'not_found': {
+                'ids': [book_id for book_id in ids if book_id not in by_id],
+                'isbns': [isbn for isbn in isbns if isbn not in by_isbn],
+            },
+        })
+
+    @action(detail=False, methods=['post'])
+    def reserve(self, request):
+        """Atomically decrement stock for a batch of books"""
+        serializer = StockReservationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        results = reserve_stock(
+            serializer.validated_data['items'],
+            all_or_nothing=serializer.validated_data['all_or_nothing'],
+        )
+        reserved = all(result['reserved'] for result in results)
+        return Response(
+            {'reserved': reserved, 'items': results},
+            status=status.HTTP_200_OK if reserved else status.HTTP_409_CONFLICT
+        )
+
+    @action(detail=False, methods=['post'])
+    def release(self, request):
+        """Return reserved quantities to stock (e.g. cancelled or failed orders)"""
+        serializer = StockReservationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        results = release_stock(serializer.validated_data['items'])
+        return Response({
+            'released': all(result['released'] for result in results),
+            'items': results,
+        })
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the whole catalog (or changes since updated_since) as NDJSON or CSV"""
+        output = request.query_params.get('output', 'ndjson')
+        if output not in EXPORT_FORMATS:
+            return Response({'error': f'output must be one of {", ".join(EXPORT_FORMATS)}'},
+                           status=status.HTTP_400_BAD_REQUEST)
+
+        # Ordered on (updated_at, id) so incremental syncs can resume from the
+        # last updated_at they saw; served by book_updated_at_id_idx
+        books = Book.objects.order_by('updated_at', 'id')
+        updated_since = request.query_params.get('updated_since')
+        if updated_since:
+            since = parse_datetime(updated_since)
+            if since is None:
+                return Response({'error': 'updated_since must be an ISO 8601 datetime'},
+                               status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            books = books.filter(updated_at__gte=since)
+
+        stream, content_type, filename = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(stream(books), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Facet counts (category, price band, in stock, top authors) for the current filters"""
+        try:
+            category_id = request.query_params.get('category_id')
+            category_id = int(category_id) if category_id else None
+            band = request.query_params.get('price_band')
+            band = int(band) if band else None
+        except ValueError:
+            return Response({'error': 'category_id and price_band must be integers'},
+                           status=status.HTTP_400_BAD_REQUEST)
+        in_stock = request.query_params.get('in_stock')
+        in_stock = in_stock.lower() in ('1', 'true', 'yes') if in_stock else None
+
+        counts = facet_counts(category_id, band, in_stock)
+        category_names = dict(Category.objects.values_list('id', 'name'))
+        return Response({
+            'categories': [
+                {'id': int(value) or None,
+                 'name': category_names.get(int(value), 'Uncategorised'),
+                 'count': count}
+                for value, count in sorted(counts['category'].items(), key=lambda item: -item[1])
+            ],
+            'price_bands': [
+                {'band': band, 'label': label, 'count': counts['price_band'].get(str(band), 0)}
+                for band, label in enumerate(PRICE_BAND_LABELS)
+            ],
+            'in_stock': {
+                'true': counts['in_stock'].get('true', 0),
+                'false': counts['in_stock'].get('false', 0),
+            },
+            'authors': [
+                {'name': value, 'count': count}
+                for value, count in sorted(counts['author'].items(), key=lambda item: (-item[1], item[0]))
+            ],
+        })
+
+    @action(detail=False, methods=['post'])
+    def ratings(self, request):
+        """Receive a batch of rating summaries pushed by reviews-service"""
+        secret = request.headers.get('X-Book-Ratings-Secret', '')
+        if not settings.BOOK_RATINGS_PUSH_SECRET \
+                or not hmac.compare_digest(secret, settings.BOOK_RATINGS_PUSH_SECRET):
+            return Response({'error': 'Invalid ratings secret'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = RatingSummaryBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        updated = apply_rating_summaries(
+            serializer.validated_data['ratings'], serializer.validated_data['as_of']
+        )
+        return Response({'updated': len(updated)})
@@ -20,6 +20,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'corsheaders',
     'books',
@@ -99,6 +100,48 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20,
 }
 
+# External service URLs
+REVIEWS_SERVICE_URL = config('REVIEWS_SERVICE_URL', default='http://reviews-service:8005')
+
+# Upstream fan-out (books.upstream): pool size and per-request deadline in seconds
+UPSTREAM_MAX_WORKERS = config('UPSTREAM_MAX_WORKERS', default=16, cast=int)
+BOOK_PAGE_UPSTREAM_TIMEOUT = config('BOOK_PAGE_UPSTREAM_TIMEOUT', default=1.0, cast=float)
+
+# Cache settings: Redis when REDIS_HOST is set, per-process memory otherwise
+REDIS_HOST = config('REDIS_HOST', default='')
+REDIS_PORT = config('REDIS_PORT', default='6379')
+
+if REDIS_HOST:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/0',
+            'KEY_PREFIX': 'books-service',
+            'OPTIONS': {
+                'socket_connect_timeout': 0.25,
+                'socket_timeout': 0.25,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Two-tier catalog cache (books.cache): local LRU in front of CACHES['default']
+BOOKS_CACHE = {
+    'LOCAL_MAXSIZE': config('BOOKS_CACHE_LOCAL_MAXSIZE', default=1024, cast=int),
+    'LOCAL_TTL': config('BOOKS_CACHE_LOCAL_TTL', default=5, cast=int),
+    'TTL': config('BOOKS_CACHE_TTL', default=300, cast=int),
+}
+
+# Rating summaries pushed by reviews-service (books.ratings): shared secret
+# (pushes are rejected while unset) and how far ahead of this clock `as_of` may be
+BOOK_RATINGS_PUSH_SECRET = config('BOOK_RATINGS_PUSH_SECRET', default='')
+BOOK_RATINGS_MAX_CLOCK_SKEW = config('BOOK_RATINGS_MAX_CLOCK_SKEW', default=60.0, cast=float)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -4,14 +4,20 @@ URL configuration for books_service project.
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
+from books.cache import catalog_cache
 
 def health_check(request):
     """Health check endpoint for Kubernetes probes"""
     return JsonResponse({'status': 'healthy', 'service': 'books-service'})
 
+def cache_stats(request):
+    """Hit/miss counters for this process's catalog cache"""
+    return JsonResponse(catalog_cache.stats())
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('books.urls')),
     path('health', health_check, name='health'),
+    path('cache-stats', cache_stats, name='cache-stats'),
 ]
 
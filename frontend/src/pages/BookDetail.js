@@ -17,15 +17,16 @@ const BookDetail = () => {
   const user = auth.getUser();
 
   useEffect(() => {
-    fetchBook();
-    fetchReviews();
-    fetchStats();
+    fetchPage();
   }, [id]);
 
-  const fetchBook = async () => {
+  // Book, reviews and rating summary arrive in a single request
+  const fetchPage = async () => {
     try {
-      const data = await bookApi.getBook(id);
-      setBook(data);
+      const data = await bookApi.getBookPage(id);
+      setBook(data.book);
+      setReviews(Array.isArray(data.reviews) ? data.reviews : []);
+      setStats(data.stats);
     } catch (error) {
       console.error('Error fetching book:', error);
     } finally {
@@ -33,24 +34,6 @@ const BookDetail = () => {
     }
   };
 
-  const fetchReviews = async () => {
-    try {
-      const data = await reviewApi.getReviewsByBook(id);
-      setReviews(Array.isArray(data.reviews) ? data.reviews : []);
-    } catch (error) {
-      console.error('Error fetching reviews:', error);
-    }
-  };
-
-  const fetchStats = async () => {
-    try {
-      const data = await reviewApi.getBookStatistics(id);
-      setStats(data);
-    } catch (error) {
-      console.error('Error fetching stats:', error);
-    }
-  };
-
   const handleAddToCart = () => {
     if (!book) return;
     
@@ -78,8 +61,7 @@ const BookDetail = () => {
       });
       alert('Review submitted successfully!');
       setReviewForm({ rating: 5, comment: '' });
-      fetchReviews();
-      fetchStats();
+      fetchPage();
     } catch (error) {
       alert(`Error: ${error.message}`);
     }
@@ -7,6 +7,7 @@ import './Orders.css';
 const Orders = () => {
   const navigate = useNavigate();
   const [orders, setOrders] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [loading, setLoading] = useState(true);
   const user = auth.getUser();
 
@@ -22,7 +23,8 @@ const Orders = () => {
   const fetchOrders = async () => {
     try {
       const data = await orderService.getOrdersByUser(user.id);
-      setOrders(Array.isArray(data) ? data : []);
+      setOrders(Array.isArray(data.results) ? data.results : []);
+      setNextPage(data.next);
     } catch (error) {
       console.error('Error fetching orders:', error);
     } finally {
@@ -30,6 +32,16 @@ const Orders = () => {
     }
   };
 
+  const loadMore = async () => {
+    try {
+      const data = await orderService.getOrdersPage(nextPage);
+      setOrders([...orders, ...data.results]);
+      setNextPage(data.next);
+    } catch (error) {
+      console.error('Error fetching orders:', error);
+    }
+  };
+
   if (loading) {
     return <div className="spinner"></div>;
   }
@@ -77,6 +89,9 @@ const Orders = () => {
                 </div>
               </div>
             ))}
+            {nextPage && (
+              <button onClick={loadMore} className="btn btn-secondary">Load more</button>
+            )}
           </div>
         )}
       </div>
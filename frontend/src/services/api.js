@@ -63,12 +63,15 @@ export const userService = {
 export const bookService = {
   getBooks: (params) => booksApi.get('/books/', { params }),
   getBook: (id) => booksApi.get(`/books/${id}/`),
+  getBookPage: (id) => booksApi.get(`/books/${id}/page/`),
   createBook: (data) => booksApi.post('/books/', data),
   updateBook: (id, data) => booksApi.put(`/books/${id}/`, data),
   deleteBook: (id) => booksApi.delete(`/books/${id}/`),
   searchBooks: (query) => booksApi.get('/books/search/', { params: { q: query } }),
+  suggestBooks: (query, limit) => booksApi.get('/books/suggest/', { params: { q: query, limit } }),
   getBooksByCategory: (categoryId) => booksApi.get('/books/by_category/', { params: { category_id: categoryId } }),
   getBooksByAuthor: (author) => booksApi.get('/books/by_author/', { params: { author } }),
+  getFacets: (params) => booksApi.get('/books/facets/', { params }),
   getCategories: () => booksApi.get('/categories/'),
   createCategory: (data) => booksApi.post('/categories/', data),
 };
@@ -81,6 +84,8 @@ export const orderService = {
   updateOrder: (id, data) => ordersApi.put(`/orders/${id}/`, data),
   updateOrderStatus: (id, status) => ordersApi.patch(`/orders/${id}/update_status/`, { status }),
   getOrdersByUser: (userId) => ordersApi.get('/orders/by_user/', { params: { user_id: userId } }),
+  // Cursor pages: follow the absolute `next` URL from the previous page
+  getOrdersPage: (url) => ordersApi.get(url),
 };
 
 // Payments Service
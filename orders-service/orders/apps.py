@@ -1,7 +1,21 @@
 from django.apps import AppConfig
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.db.models.signals import post_migrate
+
+
+def create_shard_state(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # Outside any request transaction, so the id counter is never rolled back
+    if using == DEFAULT_DB_ALIAS:
+        from .sharding import setup_shards
+        try:
+            setup_shards()
+        except DatabaseError:
+            pass  # a shard is not migrated yet; created on first use instead
 
 
 class OrdersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'orders'
 
+    def ready(self):
+        post_migrate.connect(create_shard_state, sender=self)
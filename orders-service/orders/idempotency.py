@@ -0,0 +1,114 @@
+"""
+Idempotency-Key support for order creation.
+
+The first request with a key claims an IdempotencyKey row and keeps it
+locked (SELECT ... FOR UPDATE) while the order is processed, so the stored
+response commits together with the order. A duplicate blocks on that lock,
+then replays the stored response instead of re-running validation and
+checkout. If the first request fails without a response, whoever holds the
+lock next processes the request instead. Keys are stored on the shard of the
+order they create (orders.sharding), to commit with it.
+"""
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# SQLSTATE raised when lock_timeout expires
+LOCK_NOT_AVAILABLE = '55P03'
+
+
+def request_fingerprint(request):
+    """Hash of what the key stands for; a key reused for another request is rejected"""
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def _lock(key, fingerprint, using):
+    """Claim the key if new, then lock its row; returns the locked IdempotencyKey"""
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=settings.ORDER_IDEMPOTENCY_TTL)
+    keys = IdempotencyKey.objects.using(using)
+    while True:
+        keys.bulk_create(
+            [IdempotencyKey(key=key, fingerprint=fingerprint, expires_at=expires_at)],
+            ignore_conflicts=True,
+        )
+        try:
+            record = keys.select_for_update().get(key=key)
+        except IdempotencyKey.DoesNotExist:
+            continue  # purged between the claim and the lock
+        if record.expires_at <= now:
+            # An expired key starts over as a new request
+            record.fingerprint = fingerprint
+            record.status_code = record.response_body = None
+            record.expires_at = expires_at
+            record.save(update_fields=['fingerprint', 'status_code', 'response_body', 'expires_at'])
+        return record
+
+
+def _lock_with_timeout(key, fingerprint, using):
+    """_lock(), waiting at most ORDER_IDEMPOTENCY_WAIT for an in-flight duplicate"""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return _lock(key, fingerprint, using)
+    with connection.cursor() as cursor:
+        cursor.execute('SET LOCAL lock_timeout = %s',
+                       [f'{int(settings.ORDER_IDEMPOTENCY_WAIT * 1000)}ms'])
+        record = _lock(key, fingerprint, using)
+        cursor.execute('SET LOCAL lock_timeout = DEFAULT')
+    return record
+
+
+def idempotent_response(request, handler, using):
+    """Run handler() at most once per Idempotency-Key and replay its response.
+
+    `using` is the database handler() writes the order to.
+    """
+    key = request.headers.get(HEADER)
+    if not key:
+        return handler()
+    if len(key) > MAX_KEY_LENGTH:
+        return Response({'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    fingerprint = request_fingerprint(request)
+    try:
+        with transaction.atomic(using=using):
+            record = _lock_with_timeout(key, fingerprint, using)
+
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {'error': f'{HEADER} was already used for a different request'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            if record.status_code is not None:
+                response = Response(record.response_body, status=record.status_code)
+                response['Idempotent-Replayed'] = 'true'
+                return response
+
+            response = handler()
+            # 5xx outcomes (e.g. upstream unavailable) stay retryable
+            if response.status_code < 500:
+                record.status_code = response.status_code
+                record.response_body = response.data
+                record.save(update_fields=['status_code', 'response_body'])
+            return response
+    except OperationalError as exc:
+        if getattr(exc.__cause__, 'pgcode', None) != LOCK_NOT_AVAILABLE:
+            raise
+        return Response(
+            {'error': f'A request with this {HEADER} is still in progress'},
+            status=status.HTTP_409_CONFLICT
+        )
@@ -0,0 +1,159 @@
+"""
+Asynchronous order intake.
+
+With ORDER_INTAKE_MODE = 'async', create stores the order as PENDING with an
+OrderIntakeJob and answers 202 at once. Worker processes then claim jobs from
+that table with SELECT ... FOR UPDATE SKIP LOCKED, so any number of workers
+share the queue without a broker and without picking the same job. A job
+stays locked while it is processed; if a worker dies the lock is released
+and another worker picks the job up.
+
+A job confirms its order (re-priced from books-service, stock reserved) or
+cancels it. The worker holds the order's row lock while it does, and an
+order that is no longer PENDING by then (cancelled meanwhile) is left as it
+is. Upstream outages are retried with backoff up to
+ORDER_INTAKE_MAX_ATTEMPTS before the order is cancelled. Jobs live on their
+order's shard, and workers poll every shard in turn.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from .models import Order, OrderIntakeJob, OrderItem
+from .outbox import record_order_event
+from .sharding import shard_aliases, shard_for_user
+from .validation import ValidationFailed, release_stock, verify_and_reserve
+
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 60
+
+
+def enqueue_order(serializer):
+    """Save a validated OrderCreateSerializer as PENDING and queue its validation"""
+    # serializer.save() commits the order on its shard; the job joins that transaction
+    shard = shard_for_user(serializer.validated_data['user_id'], write=True)
+    with transaction.atomic(using=shard):
+        order = serializer.save()
+        OrderIntakeJob.objects.using(shard).create(order=order)
+    return order
+
+
+def claim_job(shard):
+    """Lock the shard's next due job and its order, skipping jobs other workers hold; None if idle"""
+    job = OrderIntakeJob.objects.using(shard).select_for_update(skip_locked=True).filter(
+        status='QUEUED', available_at__lte=timezone.now()
+    ).order_by('available_at', 'id').first()
+    if job is not None:
+        # Status changes through the API wait for this lock until the job is done
+        job.order = Order.objects.using(shard).select_for_update().get(pk=job.order_id)
+    return job
+
+
+def _finish(job, order_status, error=''):
+    if job.order.can_transition(order_status):
+        job.order.status = order_status
+        job.order.save(update_fields=['status', 'updated_at'])
+        record_order_event(job.order, 'order.status_changed')
+    job.status = 'DONE' if order_status == 'CONFIRMED' else 'FAILED'
+    job.last_error = error
+    job.save(update_fields=['status', 'last_error', 'attempts', 'updated_at'])
+
+
+def _retry_or_fail(job, error):
+    job.attempts += 1
+    if job.attempts >= settings.ORDER_INTAKE_MAX_ATTEMPTS:
+        logger.warning('Cancelling order %s after %s attempts: %s', job.order_id, job.attempts, error)
+        _finish(job, 'CANCELLED', error)
+        return
+    job.available_at = timezone.now() + timedelta(seconds=min(2 ** job.attempts, MAX_RETRY_DELAY))
+    job.last_error = error
+    job.save(update_fields=['attempts', 'available_at', 'last_error', 'updated_at'])
+
+
+def process_job(job):
+    """Validate, price and reserve stock for a claimed job's order"""
+    order = job.order
+    if order.status != 'PENDING':
+        job.status = 'DONE'
+        job.last_error = f'Order was already {order.status}'
+        job.save(update_fields=['status', 'last_error', 'updated_at'])
+        return
+    order_items = list(order.items.all())
+    items = [{'book_id': item.book_id, 'quantity': item.quantity} for item in order_items]
+    try:
+        stock_items = verify_and_reserve(order.user_id, items)
+    except ValidationFailed as exc:
+        if exc.status_code >= 500:
+            _retry_or_fail(job, exc.message)
+        else:
+            job.attempts += 1
+            _finish(job, 'CANCELLED', exc.message)
+        return
+
+    try:
+        prices = {item['book_id']: Decimal(str(item['price'])) for item in items}
+        for item in order_items:
+            item.price = prices[item.book_id]
+        OrderItem.objects.using(order._state.db).bulk_update(order_items, ['price'])
+        order.total_amount = sum(
+            (item.price * item.quantity for item in order_items), Decimal('0')
+        ).quantize(Decimal('0.01'))
+        order.stock_reserved = True
+        order.save(update_fields=['total_amount', 'stock_reserved', 'updated_at'])
+        job.attempts += 1
+        _finish(job, 'CONFIRMED')
+    except Exception:
+        release_stock(stock_items)
+        raise
+
+
+def run_once():
+    """Claim and process up to one job per shard; returns how many (0 when nothing is due)"""
+    return sum(run_shard_once(shard) for shard in shard_aliases())
+
+
+def run_shard_once(shard):
+    with transaction.atomic(using=shard):
+        job = claim_job(shard)
+        if job is None:
+            return False
+        try:
+            with transaction.atomic(using=shard):
+                process_job(job)
+        except Exception as exc:
+            # The savepoint undid the partial writes; the job and order rows are still locked
+            logger.exception('Intake job for order %s failed', job.order_id)
+            job.refresh_from_db()
+            job.order.refresh_from_db()
+            _retry_or_fail(job, str(exc))
+    return True
+
+
+def queue_stats():
+    """Queue depth and age, for the /intake-stats endpoint"""
+    now = timezone.now()
+    stats = {'queued': 0, 'due': 0, 'retrying': 0, 'failed': 0}
+    oldest = None
+    for shard in shard_aliases():
+        counts = OrderIntakeJob.objects.using(shard).aggregate(
+            queued=Count('pk', filter=Q(status='QUEUED')),
+            due=Count('pk', filter=Q(status='QUEUED', available_at__lte=now)),
+            retrying=Count('pk', filter=Q(status='QUEUED', attempts__gt=0)),
+            failed=Count('pk', filter=Q(status='FAILED')),
+            oldest_queued=Min('created_at', filter=Q(status='QUEUED')),
+        )
+        shard_oldest = counts.pop('oldest_queued')
+        if shard_oldest and (oldest is None or shard_oldest < oldest):
+            oldest = shard_oldest
+        for key, value in counts.items():
+            stats[key] += value
+    stats['oldest_queued_age_seconds'] = (now - oldest).total_seconds() if oldest else 0
+    stats['mode'] = settings.ORDER_INTAKE_MODE
+    return stats
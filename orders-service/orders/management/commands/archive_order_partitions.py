@@ -0,0 +1,36 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from orders.partitions import ARCHIVE_SCHEMA, add_months, archivable_months, archive_month, month_start
+from orders.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = f'Detach old monthly order partitions into the {ARCHIVE_SCHEMA} schema'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-months', type=int,
+                            default=settings.ORDER_PARTITION_RETENTION_MONTHS,
+                            help='Archive months that ended at least this many months ago')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only list the months that would be archived')
+
+    def handle(self, *args, **options):
+        if any(connections[shard].vendor != 'postgresql' for shard in shard_aliases()):
+            raise CommandError('Order table partitioning needs PostgreSQL')
+        if options['older_than_months'] < 1:
+            raise CommandError('--older-than-months must be at least 1')
+
+        before = add_months(month_start(datetime.now(dt_timezone.utc)), -options['older_than_months'])
+        for shard in shard_aliases():
+            for month in archivable_months(before, shard):
+                label = f'{shard} {month:%Y-%m}'
+                if options['dry_run']:
+                    self.stdout.write(f'Would archive {label}')
+                elif archive_month(month, shard):
+                    self.stdout.write(self.style.SUCCESS(f'Archived {label} into {ARCHIVE_SCHEMA}'))
+                else:
+                    self.stdout.write(self.style.WARNING(f'Kept {label}: it still has open orders'))
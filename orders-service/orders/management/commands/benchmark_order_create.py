@@ -0,0 +1,91 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.test.utils import CaptureQueriesContext
+
+from orders.models import Order, OrderItem
+from orders.serializers import OrderCreateSerializer
+from orders.sharding import shard_for_user
+
+
+BENCHMARK_USER_ID = 1
+
+
+class Rollback(Exception):
+    pass
+
+
+def create_per_item(validated_data):
+    """The previous write path: one INSERT per item, then an UPDATE for the total"""
+    items_data = validated_data.pop('items')
+    shard = shard_for_user(validated_data['user_id'])
+    order = Order.objects.using(shard).create(**validated_data)
+    total_amount = 0
+    for item_data in items_data:
+        item = OrderItem.objects.using(shard).create(order=order, **item_data)
+        total_amount += item.price * item.quantity
+    order.total_amount = total_amount
+    order.save()
+    return order
+
+
+def create_bulk(validated_data):
+    return OrderCreateSerializer().create(validated_data)
+
+
+class Command(BaseCommand):
+    help = 'Compare statement count and latency of order creation write paths (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100],
+                            help='Items per order')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        paths = {'per-item': create_per_item, 'bulk': create_bulk}
+        self.stdout.write(f"{'items':>6} {'path':<9} {'queries':>8} {'ms/order':>10}")
+        for size in options['sizes']:
+            results = {}
+            for name, create in paths.items():
+                queries = self._queries(create, size)
+                seconds = self._time(create, size, options['repeat'])
+                results[name] = seconds
+                self.stdout.write(f'{size:>6} {name:<9} {queries:>8} {seconds * 1000:>10.2f}')
+            self.stdout.write(self.style.SUCCESS(
+                f"{size:>6} bulk is {results['per-item'] / results['bulk']:.1f}x faster"
+            ))
+
+    def _order(self, size):
+        return {
+            'user_id': BENCHMARK_USER_ID,
+            'shipping_address': '1 Benchmark Street',
+            'items': [
+                {'book_id': book_id, 'quantity': 2, 'price': Decimal('9.99')}
+                for book_id in range(1, size + 1)
+            ],
+        }
+
+    def _run(self, create, size):
+        # Every run is rolled back so the benchmark leaves no orders behind
+        try:
+            with transaction.atomic(using=shard_for_user(BENCHMARK_USER_ID)):
+                create(self._order(size))
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _queries(self, create, size):
+        with CaptureQueriesContext(connections[shard_for_user(BENCHMARK_USER_ID)]) as captured:
+            self._run(create, size)
+        # Exclude transaction bookkeeping; both paths pay it equally
+        return sum(1 for query in captured.captured_queries
+                   if not query['sql'].upper().startswith(('BEGIN', 'SAVEPOINT', 'RELEASE', 'ROLLBACK')))
+
+    def _time(self, create, size, repeat):
+        self._run(create, size)  # warm up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            self._run(create, size)
+        return (time.perf_counter() - start) / repeat
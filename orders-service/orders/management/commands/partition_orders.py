@@ -0,0 +1,55 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from orders.partitions import (
+    PARTITIONED, add_months, convert, default_rows, ensure_partitions, is_partitioned, month_start
+)
+from orders.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = 'Partition the order tables by month (PostgreSQL) and keep future partitions created'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--convert', action='store_true',
+                            help='Rebuild unpartitioned tables as partitioned ones (locks them)')
+        parser.add_argument('--months-ahead', type=int, default=settings.ORDER_PARTITION_MONTHS_AHEAD,
+                            help='Months after the current one to create partitions for')
+        parser.add_argument('--database', choices=shard_aliases(),
+                            help='Only this shard (default: every shard)')
+
+    def handle(self, *args, **options):
+        shards = [options['database']] if options['database'] else shard_aliases()
+        if any(connections[shard].vendor != 'postgresql' for shard in shards):
+            raise CommandError('Order table partitioning needs PostgreSQL')
+        for shard in shards:
+            self.partition(shard, options)
+
+    def partition(self, shard, options):
+        with connections[shard].cursor() as cursor:
+            partitioned = all(is_partitioned(cursor, table) for table, _ in PARTITIONED)
+        if not partitioned:
+            if not options['convert']:
+                raise CommandError(f'The order tables on {shard} are not partitioned yet; run with --convert')
+            skipped = convert(options['months_ahead'], shard)
+            self.stdout.write(self.style.SUCCESS(f'{shard}: converted the order tables to monthly partitions'))
+            for name in skipped:
+                self.stdout.write(self.style.WARNING(
+                    f'{shard}: dropped unique constraint {name}: it does not contain the partition key'
+                ))
+
+        this_month = month_start(datetime.now(dt_timezone.utc))
+        created = ensure_partitions(this_month, add_months(this_month, options['months_ahead']), shard)
+        self.stdout.write(f'{shard}: created {len(created)} partition(s)'
+                          + (f": {', '.join(created)}" if created else ''))
+
+        with connections[shard].cursor() as cursor:
+            for table, count in default_rows(cursor, shard).items():
+                if count:
+                    # These rows are never pruned, and block creating their months' partitions
+                    self.stdout.write(self.style.WARNING(
+                        f'{shard}: {table}_default holds {count} row(s) outside every monthly partition'
+                    ))
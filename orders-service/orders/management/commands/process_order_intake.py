@@ -0,0 +1,78 @@
+import logging
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from orders.intake import queue_stats, run_once
+
+
+logger = logging.getLogger(__name__)
+
+
+def work(poll_interval, stop):
+    """Worker process loop: drain due jobs, sleep when the queue is idle"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    while not stop.is_set():
+        try:
+            if not run_once():
+                stop.wait(poll_interval)
+        except Exception:
+            # Lost database connection and the like; back off and reconnect
+            logger.exception('Intake worker error')
+            connections.close_all()
+            stop.wait(poll_interval)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run async order intake workers (SELECT ... FOR UPDATE SKIP LOCKED queue)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=settings.ORDER_INTAKE_WORKERS)
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.ORDER_INTAKE_POLL_INTERVAL,
+                            help='Seconds an idle worker waits before polling again')
+        parser.add_argument('--stats-interval', type=float, default=60,
+                            help='Seconds between queue-depth log lines (0 disables)')
+        parser.add_argument('--once', action='store_true',
+                            help='Process due jobs in this process and exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = 0
+            while True:
+                claimed = run_once()
+                if not claimed:
+                    break
+                processed += claimed
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} intake jobs'))
+            return
+
+        # Children must not inherit the parent's database connection
+        connections.close_all()
+        stop = multiprocessing.Event()
+        workers = [
+            multiprocessing.Process(target=work, args=(options['poll_interval'], stop),
+                                    name=f'intake-worker-{n}')
+            for n in range(options['workers'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} intake workers")
+
+        try:
+            while any(worker.is_alive() for worker in workers):
+                if options['stats_interval']:
+                    self.stdout.write(f'Intake queue: {queue_stats()}')
+                    connections.close_all()
+                time.sleep(options['stats_interval'] or 1)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping intake workers')
+        finally:
+            stop.set()
+            for worker in workers:
+                worker.join()
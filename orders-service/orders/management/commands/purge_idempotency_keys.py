@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.models import IdempotencyKey
+from orders.sharding import shard_aliases
+
+
+class Command(BaseCommand):
+    help = 'Delete Idempotency-Key records whose replay window has passed'
+
+    def handle(self, *args, **options):
+        deleted = 0
+        for shard in shard_aliases():
+            count, _ = IdempotencyKey.objects.using(shard).filter(expires_at__lte=timezone.now()).delete()
+            deleted += count
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
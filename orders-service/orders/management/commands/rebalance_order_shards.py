@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.rebalance import misplaced, move_bucket, order_counts, plan_moves
+from orders.sharding import BUCKETS, load_map, shard_aliases
+
+
+class Command(BaseCommand):
+    help = 'Show, check and change which order shard serves each user bucket'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Report orders stored on a shard their bucket is not mapped to')
+        parser.add_argument('--move', type=int, nargs='+', metavar='BUCKET',
+                            help=f'Buckets (user_id % {BUCKETS}) to move to --to')
+        parser.add_argument('--to', choices=shard_aliases())
+        parser.add_argument('--spread', action='store_true',
+                            help='Plan moves that give every shard an equal share of buckets')
+        parser.add_argument('--apply', action='store_true', help='Carry out the --spread plan')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['move']:
+            if not options['to']:
+                raise CommandError('--move needs --to')
+            if any(not 0 <= bucket < BUCKETS for bucket in options['move']):
+                raise CommandError(f'Buckets run from 0 to {BUCKETS - 1}')
+            for bucket in options['move']:
+                self.move(bucket, options['to'], options['batch_size'])
+        elif options['spread']:
+            moves = plan_moves()
+            for bucket, source, target in moves:
+                if options['apply']:
+                    self.move(bucket, target, options['batch_size'])
+                else:
+                    self.stdout.write(f'Would move bucket {bucket}: {source} -> {target}')
+            if not moves:
+                self.stdout.write('Buckets are already spread evenly')
+        elif options['check']:
+            wrong = misplaced()
+            for (shard, bucket), orders in sorted(wrong.items()):
+                self.stdout.write(self.style.WARNING(
+                    f'{orders} order(s) of bucket {bucket} on {shard}, which does not serve it'
+                ))
+            if not wrong:
+                self.stdout.write(self.style.SUCCESS('Every order is on its bucket\'s shard'))
+        else:
+            self.status()
+
+    def move(self, bucket, target, batch_size):
+        moved = move_bucket(bucket, target, batch_size, log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Bucket {bucket}: moved {moved} orders to {target}'))
+
+    def status(self):
+        aliases, moving = load_map(refresh=True)
+        counts = order_counts()
+        for shard in shard_aliases():
+            buckets = [bucket for bucket, alias in enumerate(aliases) if alias == shard]
+            self.stdout.write(
+                f'{shard}: {len(buckets)} bucket(s), {sum(counts[shard].values())} order(s)'
+            )
+        for bucket in sorted(moving):
+            self.stdout.write(self.style.WARNING(f'Bucket {bucket} is moving'))
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.rollups import refresh
+
+
+class Command(BaseCommand):
+    help = 'Fold order changes since the last watermark into the daily sales rollups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rebuild every day instead of only changed ones')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep refreshing every --interval seconds')
+        parser.add_argument('--interval', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        full = options['full']
+        while True:
+            started = time.perf_counter()
+            days = refresh(full=full)
+            self.stdout.write(
+                f'Rebuilt {len(days)} day(s) in {time.perf_counter() - started:.2f}s'
+                + (f': {days[0]} .. {days[-1]}' if days else '')
+            )
+            if not options['loop']:
+                break
+            full = False
+            time.sleep(options['interval'])
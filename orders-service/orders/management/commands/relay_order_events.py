@@ -0,0 +1,47 @@
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from orders.outbox import purge_events, push_events, sequence_events, subscriber_clients
+
+
+class Command(BaseCommand):
+    help = 'Sequence outbox events and push them to ORDER_EVENT_SUBSCRIBERS (at-least-once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait when there is nothing to relay')
+        parser.add_argument('--once', action='store_true',
+                            help='Relay until nothing is pending, then exit')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        clients = subscriber_clients()
+        last_purge = 0
+        while True:
+            relayed = sequence_events(batch_size * 2)
+            for name, client in clients.items():
+                try:
+                    while True:
+                        pushed = push_events(name, client, batch_size)
+                        relayed += pushed
+                        if pushed < batch_size:
+                            break
+                except requests.RequestException as exc:
+                    # The cursor did not move; this subscriber retries next round
+                    self.stderr.write(f'Delivery to {name} failed: {exc}')
+
+            if time.monotonic() - last_purge > 3600:
+                purged = purge_events(settings.ORDER_EVENT_RETENTION_DAYS)
+                if purged:
+                    self.stdout.write(f'Purged {purged} delivered events')
+                last_purge = time.monotonic()
+
+            if not relayed:
+                if options['once']:
+                    self.stdout.write(self.style.SUCCESS('Relay caught up'))
+                    return
+                time.sleep(options['interval'])
@@ -1,4 +1,6 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
 
 class Order(models.Model):
@@ -12,30 +14,246 @@ class Order(models.Model):
         ('CANCELLED', 'Cancelled'),
     ]
 
-    user_id = models.IntegerField()  # Reference to Users service
+    # Allowed status changes: current status -> statuses it may move to
+    STATUS_TRANSITIONS = {
+        'PENDING': {'CONFIRMED', 'PROCESSING', 'CANCELLED'},
+        'CONFIRMED': {'PROCESSING', 'CANCELLED'},
+        'PROCESSING': {'SHIPPED', 'CANCELLED'},
+        'SHIPPED': {'DELIVERED'},
+        'DELIVERED': set(),
+        'CANCELLED': set(),
+    }
+
+    # Assigned on first save by orders.sharding: globally unique across shards
+    id = models.BigIntegerField(primary_key=True, editable=False)
+    user_id = models.IntegerField()  # Reference to Users service; the shard key
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     shipping_address = models.TextField()
+    # Whether books-service holds stock for the items (returned on cancellation)
+    stock_reserved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def save(self, *args, **kwargs):
+        if self.id is None:
+            from .sharding import next_order_id
+            self.id = next_order_id(self.user_id)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Order {self.id} - User {self.user_id} - {self.status}"
 
+    @classmethod
+    def statuses_leading_to(cls, new_status):
+        """Statuses an order may be in to move to new_status"""
+        return sorted(old for old, targets in cls.STATUS_TRANSITIONS.items() if new_status in targets)
+
+    def can_transition(self, new_status):
+        return new_status in self.STATUS_TRANSITIONS[self.status]
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination (see orders.pagination), unfiltered and per filter
+            models.Index(fields=['-created_at', 'id'], name='order_created_at_id_idx'),
+            models.Index(fields=['user_id', '-created_at', 'id'], name='order_user_created_idx'),
+            models.Index(fields=['status', '-created_at', 'id'], name='order_status_created_idx'),
+            # Incremental rollup refresh (orders.rollups)
+            models.Index(fields=['updated_at'], name='order_updated_at_idx'),
+        ]
 
 
 class OrderItem(models.Model):
     """Order item model"""
-    order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
+    # No database FK: a partitioned orders table (orders.partitions) cannot be
+    # referenced by id alone. Deletes still cascade through the ORM.
+    order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE,
+                              db_constraint=False)
     book_id = models.IntegerField()  # Reference to Books service
     quantity = models.IntegerField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Copy of order.created_at, the partition key of both tables
+    order_created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    def save(self, *args, **kwargs):
+        if self.order_id is not None:
+            self.order_created_at = self.order.created_at
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Order {self.order.id} - Book {self.book_id} - Qty {self.quantity}"
 
     class Meta:
-        unique_together = ['order', 'book_id']
+        constraints = [
+            # order_created_at follows from order, but a partitioned table
+            # only accepts unique keys that contain its partition key
+            models.UniqueConstraint(fields=['order', 'book_id', 'order_created_at'],
+                                    name='orderitem_order_book_uniq'),
+        ]
+
+
+class OrderIntakeJob(models.Model):
+    """Background validation of an order accepted in async intake mode.
+
+    Workers (`manage.py process_order_intake`) claim QUEUED jobs with
+    SELECT ... FOR UPDATE SKIP LOCKED; see orders.intake.
+    """
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    order = models.OneToOneField(Order, related_name='intake_job', on_delete=models.CASCADE,
+                                 db_constraint=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Intake job for Order {self.order_id} - {self.status}"
+
+    class Meta:
+        indexes = [
+            # The queue: only QUEUED jobs, in the order workers claim them
+            models.Index(fields=['available_at', 'id'], condition=models.Q(status='QUEUED'),
+                         name='intake_job_queue_idx'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """Outcome of an order request made with an Idempotency-Key header.
+
+    The row is locked while the first request is processed, so concurrent
+    duplicates wait for it and then replay the stored response.
+    """
+    key = models.CharField(max_length=255, unique=True)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Idempotency key {self.key} - {self.status_code or 'in flight'}"
+
+
+class OutboxEvent(models.Model):
+    """Order change event, written in the same transaction as the change.
+
+    `position` is left empty on insert and assigned by the relay in commit
+    order (see orders.outbox), so it is safe to use as a consumer cursor.
+    """
+    id = models.BigAutoField(primary_key=True)
+    event_type = models.CharField(max_length=50)
+    order_id = models.BigIntegerField()
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    position = models.BigIntegerField(null=True, blank=True, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.event_type} for Order {self.order_id} at {self.position or 'unsequenced'}"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(position__isnull=True),
+                         name='outbox_unsequenced_idx'),
+        ]
+
+
+class OutboxSequence(models.Model):
+    """Last event position handed out (orders.outbox); outlives purged events"""
+    name = models.CharField(max_length=50, unique=True)
+    last_position = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} at {self.last_position}"
+
+
+class OutboxCursor(models.Model):
+    """Last event position a push subscriber has acknowledged"""
+    subscriber = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.subscriber} at {self.position}"
+
+
+class DailySales(models.Model):
+    """Orders and revenue per day and status, maintained by orders.rollups"""
+    day = models.DateField()
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    orders = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.day} {self.status}: {self.orders} orders"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'status'], name='daily_sales_day_status_uniq'),
+        ]
+
+
+class DailyBookSales(models.Model):
+    """Units and revenue per day and book over non-cancelled orders (orders.rollups)"""
+    day = models.DateField()
+    book_id = models.IntegerField()
+    units = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day} Book {self.book_id}: {self.units} units"
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'book_id'], name='daily_book_sales_day_book_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['book_id', 'day'], name='daily_book_sales_book_idx'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """Point up to which order changes have been folded into the rollups"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} at {self.value}"
+
+
+class ShardBucket(models.Model):
+    """Database alias (ORDER_SHARDS) holding the orders of one user bucket.
+
+    `moving` is set while `manage.py rebalance_order_shards` copies the
+    bucket to another shard; writes for its users are refused meanwhile.
+    """
+    bucket = models.PositiveSmallIntegerField(primary_key=True)
+    alias = models.CharField(max_length=50)
+    moving = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Bucket {self.bucket} on {self.alias}" + (' (moving)' if self.moving else '')
+
+
+class OrderIdBlock(models.Model):
+    """Counter behind order ids (orders.sharding), one value per order.
+
+    On PostgreSQL the values come from a sequence and next_value is unused.
+    Ids below first_value << BUCKET_BITS predate sharding and do not encode
+    their bucket.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField()
+    first_value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name} at {self.next_value}"
@@ -0,0 +1,173 @@
+"""
+Transactional outbox for order changes.
+
+record_order_event() must run inside the transaction that changes the order,
+so an event exists exactly when its change committed. Events become visible
+to consumers once the relay (`manage.py relay_order_events`) gives them a
+position: it numbers committed, unsequenced events under an advisory lock,
+so positions only ever grow in the order consumers can see them. The last
+position is kept in OutboxSequence, so purging old events never lets
+numbering start over below a consumer's cursor. An id
+cursor would not be safe, since ids are taken at insert and transactions
+commit out of order.
+
+Events live on their order's shard (orders.sharding). Positions are still
+one sequence: the lock is taken on 'default' and each shard's batch commits
+before the next is numbered, 'default' last since its commit releases the
+lock.
+
+Consumers either pull (GET /api/orders/events/?after=<position>) or are
+pushed batches by the relay. Delivery is at-least-once, so consumers must
+ignore positions they have already applied.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Case, Max, Value, When
+from django.utils import timezone
+
+from .models import OutboxCursor, OutboxEvent, OutboxSequence
+from .service_client import ServiceClient
+from .sharding import shard_aliases
+from .summaries import forget_summaries
+
+
+# pg_advisory_xact_lock key held while assigning positions
+SEQUENCE_LOCK_ID = 0x6f726465
+
+OUTBOX_SEQUENCE = 'order-events'
+
+
+def order_snapshot(order):
+    return {
+        'id': order.id,
+        'user_id': order.user_id,
+        'status': order.status,
+        'total_amount': str(order.total_amount),
+        'created_at': order.created_at,
+        'updated_at': order.updated_at,
+    }
+
+
+def record_order_event(order, event_type):
+    """Queue an event carrying the order's current state; call inside its transaction"""
+    OutboxEvent.objects.using(order._state.db).create(
+        event_type=event_type,
+        order_id=order.id,
+        payload=order_snapshot(order),
+    )
+    transaction.on_commit(lambda: forget_summaries([order.id]), using=order._state.db)
+
+
+def record_order_events(orders, event_type):
+    """record_order_event() for many orders of one shard in one INSERT"""
+    orders = list(orders)
+    if not orders:
+        return
+    OutboxEvent.objects.using(orders[0]._state.db).bulk_create([
+        OutboxEvent(event_type=event_type, order_id=order.id, payload=order_snapshot(order))
+        for order in orders
+    ])
+    order_ids = [order.id for order in orders]
+    transaction.on_commit(lambda: forget_summaries(order_ids), using=orders[0]._state.db)
+
+
+def sequence_events(batch_size=1000):
+    """Give committed events positions in commit order; returns how many"""
+    sequenced = 0
+    shards = sorted(shard_aliases(), key=lambda alias: alias == DEFAULT_DB_ALIAS)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [SEQUENCE_LOCK_ID])
+        counter, _ = OutboxSequence.objects.using(DEFAULT_DB_ALIAS).select_for_update().get_or_create(
+            name=OUTBOX_SEQUENCE
+        )
+        # Live events also cover positions a failed run committed on other shards
+        last = max(counter.last_position, *(
+            OutboxEvent.objects.using(alias).aggregate(last=Max('position'))['last'] or 0
+            for alias in shards
+        ))
+        for alias in shards:
+            with transaction.atomic(using=alias):
+                events = OutboxEvent.objects.using(alias)
+                pending = list(events.filter(position__isnull=True).order_by('id').values_list(
+                    'id', flat=True
+                )[:batch_size])
+                if pending:
+                    events.filter(pk__in=pending).update(position=Case(
+                        *[When(pk=event_id, then=Value(last + offset))
+                          for offset, event_id in enumerate(pending, start=1)]
+                    ))
+            last += len(pending)
+            sequenced += len(pending)
+        if last != counter.last_position:
+            counter.last_position = last
+            counter.save(update_fields=['last_position'])
+    return sequenced
+
+
+def events_after(position, limit):
+    """The next `limit` events of all shards, by position"""
+    events = {}
+    for alias in shard_aliases():
+        # A bucket being moved briefly has its events on both shards
+        for event in OutboxEvent.objects.using(alias).filter(position__gt=position).order_by('position')[:limit]:
+            events.setdefault(event.position, event)
+    return [events[position] for position in sorted(events)[:limit]]
+
+
+def serialize_event(event):
+    return {
+        'position': event.position,
+        'event_type': event.event_type,
+        'order_id': event.order_id,
+        'payload': event.payload,
+        'created_at': event.created_at.isoformat(),
+    }
+
+
+def subscriber_clients():
+    return {
+        name: ServiceClient(f'events:{name}', url)
+        for name, url in settings.ORDER_EVENT_SUBSCRIBERS.items()
+    }
+
+
+def push_events(name, client, batch_size):
+    """Deliver the next batch to one subscriber; returns how many it acknowledged"""
+    cursor, _ = OutboxCursor.objects.get_or_create(subscriber=name)
+    events = events_after(cursor.position, batch_size)
+    if not events:
+        return 0
+    response = client.post('/', json={'events': [serialize_event(event) for event in events]},
+                           headers={'X-Order-Events-Secret': settings.ORDER_EVENT_RELAY_SECRET},
+                           timeout=10)
+    response.raise_for_status()
+    # Only an acknowledged batch moves the cursor: a crash before this line redelivers it
+    cursor.position = events[-1].position
+    cursor.save(update_fields=['position', 'updated_at'])
+    return len(events)
+
+
+def purge_events(days):
+    """Delete events older than `days` that every push subscriber has acknowledged.
+
+    Pull consumers are not tracked here; `days` is their window to catch up.
+    """
+    events = OutboxEvent.objects.filter(
+        position__isnull=False, created_at__lt=timezone.now() - timedelta(days=days)
+    )
+    subscribers = list(settings.ORDER_EVENT_SUBSCRIBERS)
+    if subscribers:
+        cursors = dict(OutboxCursor.objects.filter(subscriber__in=subscribers).values_list(
+            'subscriber', 'position'
+        ))
+        events = events.filter(position__lte=min(cursors.get(name, 0) for name in subscribers))
+    deleted = 0
+    for alias in shard_aliases():
+        count, _ = events.using(alias).delete()
+        deleted += count
+    return deleted
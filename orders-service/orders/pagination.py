@@ -0,0 +1,52 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OrderCursorPagination(CursorPagination):
+    """Keyset pagination on (-created_at, id), served by the Order composite indexes"""
+    ordering = ('-created_at', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_shards(self, querysets, request, view=None):
+        """paginate_queryset() over several shards: each shard's page, merged.
+
+        Every shard is asked for a full page at the cursor position, so the
+        merged page is exactly what one table would have returned. Offsets
+        for rows sharing a created_at are applied per shard.
+        """
+        if len(querysets) == 1:
+            return self.paginate_queryset(querysets[0], request, view)
+
+        merged, following, preceding = {}, [], []
+        has_next = has_previous = False
+        for queryset in querysets:
+            for order in self.paginate_queryset(queryset, request, view):
+                # A bucket being moved briefly has its orders on both shards
+                merged.setdefault(order.pk, order)
+            has_next |= self.has_next
+            has_previous |= self.has_previous
+            if self.has_next and self.next_position is not None:
+                following.append(self.next_position)
+            if self.has_previous and self.previous_position is not None:
+                preceding.append(self.previous_position)
+        merged = sorted(merged.values(), key=lambda order: (order.created_at, -order.pk), reverse=True)
+
+        if self.cursor and self.cursor.reverse:
+            self.page = merged[-self.page_size:]
+            if len(merged) > self.page_size:
+                has_previous = True
+                self.previous_position = self._get_position_from_instance(
+                    merged[-self.page_size - 1], self.ordering
+                )
+            elif preceding:
+                self.previous_position = min(preceding)
+        else:
+            self.page = merged[:self.page_size]
+            if len(merged) > self.page_size:
+                has_next = True
+                self.next_position = self._get_position_from_instance(merged[self.page_size], self.ordering)
+            elif following:
+                self.next_position = max(following)
+        self.has_next, self.has_previous = has_next, has_previous
+        return self.page
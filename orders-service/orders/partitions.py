@@ -0,0 +1,253 @@
+"""
+Monthly range partitioning of the order tables (PostgreSQL only).
+
+orders_order is partitioned on created_at and orders_orderitem on
+order_created_at, its copy of the order's created_at, so an order and its
+items always live in the same month. Queries bounded on those columns only
+touch the matching partitions; whole months of closed orders can be detached
+and moved to ARCHIVE_SCHEMA instead of being deleted row by row.
+
+Partitioned tables only accept unique keys that include the partition key,
+so the primary keys become (id, <key>) and no foreign key may point at
+orders_order; ids still come from one sequence and stay unique.
+
+Django creates the tables unpartitioned; convert() rebuilds them in place
+(`manage.py partition_orders --convert`) and ensure_partitions() keeps
+partitions created ahead of time. Every shard (orders.sharding) is
+partitioned on its own; the functions here work on the `using` alias.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connections, transaction
+
+from .models import Order, OrderItem
+
+
+ARCHIVE_SCHEMA = 'orders_archive'
+
+# Months whose orders are all in these statuses may be archived
+CLOSED_STATUSES = ('DELIVERED', 'CANCELLED')
+
+PARTITIONED = [
+    (Order._meta.db_table, 'created_at'),
+    (OrderItem._meta.db_table, 'order_created_at'),
+]
+
+PARTITION_NAME = re.compile(r'_p(\d{4})_(\d{2})$')
+
+
+def month_start(value):
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y_%m}'
+
+
+def _bound(month):
+    return month.strftime('%Y-%m-%d 00:00:00+00')
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))',
+        [table]
+    )
+    return cursor.fetchone()[0]
+
+
+def partitions(cursor, table):
+    """{month: partition name} of the monthly partitions attached to table"""
+    cursor.execute(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE pg_inherits.inhparent = to_regclass(%s)',
+        [table]
+    )
+    months = {}
+    for (name,) in cursor.fetchall():
+        match = PARTITION_NAME.search(name)
+        if match:
+            months[datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)] = name
+    return months
+
+
+def create_partition(cursor, table, month, using):
+    """Attach the partition for one month unless it exists; returns whether it was created"""
+    if month in partitions(cursor, table):
+        return False
+    quote = connections[using].ops.quote_name
+    cursor.execute(
+        f'CREATE TABLE {quote(partition_name(table, month))} PARTITION OF {quote(table)} '
+        'FOR VALUES FROM (%s) TO (%s)',
+        [_bound(month), _bound(add_months(month, 1))]
+    )
+    return True
+
+
+def ensure_partitions(first_month, last_month, using):
+    """Create the partitions of both tables for first_month..last_month; returns the new names"""
+    created = []
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        for table, _ in PARTITIONED:
+            month = month_start(first_month)
+            while month <= last_month:
+                if create_partition(cursor, table, month, using):
+                    created.append(partition_name(table, month))
+                month = add_months(month, 1)
+    return created
+
+
+def default_rows(cursor, using):
+    """Rows that fell outside every monthly partition, per table"""
+    quote = connections[using].ops.quote_name
+    counts = {}
+    for table, _ in PARTITIONED:
+        cursor.execute(f'SELECT count(*) FROM {quote(table + "_default")}')
+        counts[table] = cursor.fetchone()[0]
+    return counts
+
+
+def _convert_table(cursor, table, key, first_month, last_month, using):
+    quote = connections[using].ops.quote_name
+    legacy = f'{table}_unpartitioned'
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE contype = 'u' AND conrelid = to_regclass(%s)",
+        [table]
+    )
+    constraints = cursor.fetchall()
+    cursor.execute(
+        'SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() '
+        'AND tablename = %s',
+        [table]
+    )
+    indexes = [(name, definition) for name, definition in cursor.fetchall()
+               if name != f'{table}_pkey' and name not in dict(constraints)]
+
+    cursor.execute(f'ALTER TABLE {quote(table)} RENAME TO {quote(legacy)}')
+    cursor.execute(
+        f'CREATE TABLE {quote(table)} (LIKE {quote(legacy)} INCLUDING DEFAULTS INCLUDING IDENTITY) '
+        f'PARTITION BY RANGE ({quote(key)})'
+    )
+    cursor.execute(f'CREATE TABLE {quote(table + "_default")} PARTITION OF {quote(table)} DEFAULT')
+    month = first_month
+    while month <= last_month:
+        create_partition(cursor, table, month, using)
+        month = add_months(month, 1)
+    cursor.execute(f'INSERT INTO {quote(table)} SELECT * FROM {quote(legacy)}')
+
+    # Keep ids growing past the copied rows; a serial column's sequence
+    # belongs to the old table and must not be dropped with it
+    cursor.execute(
+        "SELECT attidentity <> '', pg_get_serial_sequence(%s, 'id') FROM pg_attribute "
+        "WHERE attrelid = to_regclass(%s) AND attname = 'id'",
+        [legacy, legacy]
+    )
+    identity, sequence = cursor.fetchone()
+    if identity:
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+    elif sequence:
+        cursor.execute(f'ALTER SEQUENCE {sequence} OWNED BY {quote(table)}.id')
+    if sequence:
+        cursor.execute(f'SELECT setval(%s, (SELECT coalesce(max(id), 0) + 1 FROM {quote(table)}), false)',
+                       [sequence])
+
+    # Foreign keys into the old table (not possible against the new one)
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = to_regclass(%s)",
+        [legacy]
+    )
+    for referencing, constraint in cursor.fetchall():
+        cursor.execute(f'ALTER TABLE {referencing} DROP CONSTRAINT {quote(constraint)}')
+    cursor.execute(f'DROP TABLE {quote(legacy)}')
+
+    cursor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(table + "_pkey")} '
+                   f'PRIMARY KEY (id, {quote(key)})')
+    skipped = []
+    for name, definition in constraints:
+        if key not in definition:
+            skipped.append(name)
+            continue
+        cursor.execute(f'ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}')
+    for name, definition in indexes:
+        if definition.startswith('CREATE UNIQUE') and key not in definition:
+            skipped.append(name)
+            continue
+        cursor.execute(definition)
+    return skipped
+
+
+def convert(months_ahead, using):
+    """Rebuild both tables as partitioned ones, keeping their rows.
+
+    Takes exclusive locks on the order tables for the duration of the copy,
+    so run it in a maintenance window. Returns unique indexes that had to be
+    dropped because they lack the partition key.
+    """
+    quote = connections[using].ops.quote_name
+    order_table, order_key = PARTITIONED[0]
+    item_table, item_key = PARTITIONED[1]
+    skipped = []
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(order_table)}, {quote(item_table)} IN ACCESS EXCLUSIVE MODE')
+        # Items must land in their order's month
+        cursor.execute(
+            f'UPDATE {quote(item_table)} item SET {quote(item_key)} = o.{quote(order_key)} '
+            f'FROM {quote(order_table)} o '
+            f'WHERE o.id = item.order_id AND item.{quote(item_key)} <> o.{quote(order_key)}'
+        )
+        cursor.execute(f'SELECT min({quote(order_key)}) FROM {quote(order_table)}')
+        oldest = cursor.fetchone()[0]
+        now = month_start(datetime.now(dt_timezone.utc))
+        first_month = month_start(oldest.astimezone(dt_timezone.utc)) if oldest else now
+        last_month = add_months(now, months_ahead)
+        for table, key in PARTITIONED:
+            if is_partitioned(cursor, table):
+                continue
+            skipped += _convert_table(cursor, table, key, first_month, last_month, using)
+    return skipped
+
+
+def archive_month(month, using):
+    """Detach one month of both tables into ARCHIVE_SCHEMA.
+
+    Returns False, leaving the month attached, while it still has orders
+    that are not closed.
+    """
+    quote = connections[using].ops.quote_name
+    order_table, _ = PARTITIONED[0]
+    with transaction.atomic(using=using), connections[using].cursor() as cursor:
+        attached = {table: partitions(cursor, table).get(month) for table, _ in PARTITIONED}
+        if attached[order_table]:
+            status_params = ', '.join(['%s'] * len(CLOSED_STATUSES))
+            cursor.execute(
+                f'SELECT EXISTS (SELECT 1 FROM {quote(attached[order_table])} '
+                f'WHERE status NOT IN ({status_params}))',
+                list(CLOSED_STATUSES)
+            )
+            if cursor.fetchone()[0]:
+                return False
+        cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {quote(ARCHIVE_SCHEMA)}')
+        for table, _ in PARTITIONED:
+            name = attached[table]
+            if name:
+                cursor.execute(f'ALTER TABLE {quote(table)} DETACH PARTITION {quote(name)}')
+                cursor.execute(f'ALTER TABLE {quote(name)} SET SCHEMA {quote(ARCHIVE_SCHEMA)}')
+    return True
+
+
+def archivable_months(before, using):
+    """Attached months that end on or before `before`, oldest first"""
+    order_table, _ = PARTITIONED[0]
+    with connections[using].cursor() as cursor:
+        months = partitions(cursor, order_table)
+    return sorted(month for month in months if add_months(month, 1) <= before)
@@ -0,0 +1,169 @@
+"""
+Moving user buckets between order shards.
+
+A move marks the bucket moving (writes for its users now raise ShardMoving),
+waits until every process has seen that, copies the bucket's orders with
+their items, intake jobs, outbox events and the idempotency keys that created
+them to the target, points the bucket there, waits again and deletes the
+source copy. Orders keep their ids; the other rows get new ones on the target.
+
+While both copies exist, listings and event reads skip the duplicates and
+rollups of the affected days are rebuilt once the source copy is gone.
+"""
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from .models import IdempotencyKey, Order, OrderIntakeJob, OrderItem, OutboxEvent, ShardBucket
+from .rollups import rebuild_day
+from .sharding import BUCKETS, load_map, shard_aliases
+
+
+def bucket_orders(shard, bucket):
+    return Order.objects.using(shard).annotate(bucket=Mod('user_id', BUCKETS)).filter(bucket=bucket)
+
+
+def order_counts():
+    """{shard: {bucket: orders stored there}}"""
+    counts = {}
+    for shard in shard_aliases():
+        rows = Order.objects.using(shard).annotate(bucket=Mod('user_id', BUCKETS)).order_by().values(
+            'bucket'
+        ).annotate(orders=Count('pk'))
+        counts[shard] = {int(row['bucket']): row['orders'] for row in rows}
+    return counts
+
+
+def misplaced():
+    """{(shard, bucket): orders} stored on a shard the map does not give their bucket"""
+    aliases, _ = load_map(refresh=True)
+    return {
+        (shard, bucket): orders
+        for shard, buckets in order_counts().items()
+        for bucket, orders in buckets.items()
+        if aliases[bucket] != shard
+    }
+
+
+def plan_moves():
+    """[(bucket, source, target)] that spread buckets evenly over every shard"""
+    aliases, _ = load_map(refresh=True)
+    shards = shard_aliases()
+    owned = {shard: [] for shard in shards}
+    for bucket, shard in enumerate(aliases):
+        owned.setdefault(shard, []).append(bucket)
+    target = {shard: BUCKETS // len(shards) + (index < BUCKETS % len(shards))
+              for index, shard in enumerate(shards)}
+    # Buckets on shards that are no longer configured must move in any case
+    surplus = [(bucket, shard) for shard, buckets in owned.items()
+               for bucket in buckets[target.get(shard, 0):]]
+    moves = []
+    for shard in shards:
+        while len(owned[shard]) < target[shard] and surplus:
+            bucket, source = surplus.pop()
+            owned[shard].append(bucket)
+            moves.append((bucket, source, shard))
+    return moves
+
+
+def _set_bucket(bucket, **fields):
+    ShardBucket.objects.using(DEFAULT_DB_ALIAS).filter(bucket=bucket).update(
+        updated_at=timezone.now(), **fields
+    )
+
+
+def _related(shard, order_ids):
+    """Querysets of the rows that belong to these orders on a shard"""
+    return [
+        OrderItem.objects.using(shard).filter(order_id__in=order_ids),
+        OrderIntakeJob.objects.using(shard).filter(order_id__in=order_ids),
+        OutboxEvent.objects.using(shard).filter(order_id__in=order_ids),
+        # Keys are not tied to a user; the stored response names the order
+        IdempotencyKey.objects.using(shard).filter(response_body__id__in=order_ids),
+    ]
+
+
+@contextmanager
+def _keeping_timestamps(model):
+    """Let bulk_create() store auto_now/auto_now_add values as they are.
+
+    Changes the model's fields process-wide; only for the rebalancing command.
+    """
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    flags = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in flags:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _copy(source, target, order_ids):
+    orders = list(Order.objects.using(source).filter(pk__in=order_ids))
+    with _keeping_timestamps(Order):
+        Order.objects.using(target).bulk_create(orders)
+    for related in _related(source, order_ids):
+        rows = list(related)
+        for row in rows:
+            row.pk = None
+        with _keeping_timestamps(related.model):
+            # A key may already exist on the target for another user's request
+            related.model.objects.using(target).bulk_create(
+                rows, batch_size=1000, ignore_conflicts=related.model is IdempotencyKey
+            )
+    return orders
+
+
+def _delete(shard, order_ids):
+    for rows in _related(shard, order_ids):
+        rows.delete()
+    Order.objects.using(shard).filter(pk__in=order_ids).delete()
+
+
+def move_bucket(bucket, target, batch_size=500, log=None):
+    """Move one bucket's orders to `target`; returns how many orders moved"""
+    log = log or (lambda message: None)
+    aliases, _ = load_map(refresh=True)
+    source = aliases[bucket]
+    if source == target:
+        return 0
+    # Wait until every process's cached map refuses writes for the bucket
+    wait = settings.ORDER_SHARD_MAP_TTL * 2
+    _set_bucket(bucket, moving=True)
+    log(f'Bucket {bucket}: writes paused, waiting {wait:.0f}s')
+    time.sleep(wait)
+
+    try:
+        order_ids = list(bucket_orders(source, bucket).values_list('pk', flat=True))
+        days = set()
+        with transaction.atomic(using=target):
+            # Leftovers of an interrupted move
+            _delete(target, list(bucket_orders(target, bucket).values_list('pk', flat=True)))
+
+            for start in range(0, len(order_ids), batch_size):
+                batch = order_ids[start:start + batch_size]
+                days.update(timezone.localtime(order.created_at).date()
+                            for order in _copy(source, target, batch))
+            log(f'Bucket {bucket}: copied {len(order_ids)} orders from {source} to {target}')
+    except Exception:
+        _set_bucket(bucket, moving=False)
+        raise
+
+    _set_bucket(bucket, alias=target, moving=False)
+    log(f'Bucket {bucket}: now served by {target}, waiting {wait:.0f}s before cleanup')
+    time.sleep(wait)
+
+    with transaction.atomic(using=source):
+        for start in range(0, len(order_ids), batch_size):
+            _delete(source, order_ids[start:start + batch_size])
+    for day in sorted(days):
+        rebuild_day(day)
+    return len(order_ids)
@@ -0,0 +1,53 @@
+from django.db import DEFAULT_DB_ALIAS
+
+from .sharding import SHARDED_MODELS, bucket_for_order, bucket_for_user, shard_aliases, shard_for_bucket
+
+
+class OrderShardRouter:
+    """Send order data to its user's shard (orders.sharding), everything else to 'default'.
+
+    Routing needs a user or order to go on, so queries that are not made
+    through an instance (Order.objects.filter(...)) must pick their shard
+    with .using(); without one they run on 'default'.
+    """
+
+    def _is_sharded(self, model):
+        return model._meta.app_label == 'orders' and model._meta.model_name in SHARDED_MODELS
+
+    def _bucket(self, instance):
+        user_id = getattr(instance, 'user_id', None)
+        if user_id is not None:
+            return bucket_for_user(user_id)
+        order_id = getattr(instance, 'order_id', None)
+        if order_id is not None:
+            return bucket_for_order(order_id)
+        return None
+
+    def _shard(self, model, hints, write):
+        if not self._is_sharded(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        bucket = self._bucket(instance)
+        if bucket is not None and (write or not instance._state.db):
+            # Checks for writes to a moving bucket even when the shard is known
+            alias = shard_for_bucket(bucket, write=write)
+            return instance._state.db or alias
+        return instance._state.db or None
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints, write=False)
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints, write=True)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if self._is_sharded(type(obj1)) or self._is_sharded(type(obj2)):
+            return obj1._state.db == obj2._state.db
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == 'orders' and model_name in SHARDED_MODELS:
+            return db in shard_aliases()
+        return db == DEFAULT_DB_ALIAS
@@ -1,5 +1,10 @@
+from decimal import Decimal
+
+from django.db import transaction
 from rest_framework import serializers
 from .models import Order, OrderItem
+from .outbox import record_order_event
+from .sharding import shard_for_user
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -18,6 +23,29 @@ class OrderSerializer(serializers.ModelSerializer):
                   'items', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_at', 'updated_at', 'total_amount')
 
+    def validate_user_id(self, value):
+        # The user decides the order's shard (orders.sharding)
+        if self.instance is not None and value != self.instance.user_id:
+            raise serializers.ValidationError('An order cannot be moved to another user')
+        return value
+
+    def validate_status(self, value):
+        if self.instance is not None and value != self.instance.status \
+                and not self.instance.can_transition(value):
+            raise serializers.ValidationError(
+                f'Cannot change status from {self.instance.status} to {value}'
+            )
+        return value
+
+
+class OrderStatusBulkSerializer(serializers.Serializer):
+    MAX_ITEMS = 10000
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=MAX_ITEMS
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+
 
 class OrderCreateSerializer(serializers.Serializer):
     user_id = serializers.IntegerField()
@@ -26,14 +54,17 @@ class OrderCreateSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        
-        total_amount = 0
-        for item_data in items_data:
-            item = OrderItem.objects.create(order=order, **item_data)
-            total_amount += item.price * item.quantity
-        
-        order.total_amount = total_amount
-        order.save()
-        return order
+        # Total up front so the order is written once and its items in one INSERT
+        total_amount = sum(
+            (Decimal(str(item['price'])) * item['quantity'] for item in items_data), Decimal('0')
+        ).quantize(Decimal('0.01'))
 
+        shard = shard_for_user(validated_data['user_id'], write=True)
+        with transaction.atomic(using=shard):
+            order = Order.objects.using(shard).create(total_amount=total_amount, **validated_data)
+            OrderItem.objects.using(shard).bulk_create(
+                [OrderItem(order=order, order_created_at=order.created_at, **item_data)
+                 for item_data in items_data]
+            )
+            record_order_event(order, 'order.created')
+        return order
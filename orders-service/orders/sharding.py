@@ -0,0 +1,189 @@
+"""
+Horizontal sharding of orders by user_id.
+
+Users fall into BUCKETS buckets (user_id % BUCKETS) and ShardBucket maps each
+bucket to one database alias of ORDER_SHARDS. An order lives on its user's
+shard together with its items, intake job, outbox events and the
+Idempotency-Key that created it, so every write to an order commits in one
+database. Everything else (shard map, id counter, cursors, rollups) stays on
+'default'.
+
+Order ids carry their bucket in the low BUCKET_BITS bits, so an id alone
+finds its shard, even after the bucket moved. The high bits come from one
+counter on 'default' (a sequence on PostgreSQL), drawn once per order, so ids
+are unique across shards and grow with allocation time whichever process
+issues them.
+
+`manage.py rebalance_order_shards` moves buckets between shards. While a
+bucket is moving, writes for its users raise ShardMoving.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+
+from .models import Order, OrderIdBlock, ShardBucket
+
+
+BUCKET_BITS = 10
+BUCKETS = 1 << BUCKET_BITS
+
+ORDER_ID_COUNTER = 'order'
+ORDER_ID_SEQUENCE = 'orders_order_id_counter_seq'
+
+# Models stored on the order's shard (see orders.routers)
+SHARDED_MODELS = {'order', 'orderitem', 'orderintakejob', 'outboxevent', 'idempotencykey'}
+
+
+class ShardMoving(Exception):
+    """The user's orders are being moved to another shard; retry shortly"""
+
+
+_lock = threading.Lock()
+_map = {'aliases': None, 'moving': frozenset(), 'loaded_at': 0.0}
+_ids = {'counter': None, 'floor': None}
+
+
+def shard_aliases():
+    """Every shard's database alias, 'default' first"""
+    return list(settings.ORDER_SHARDS)
+
+
+def bucket_for_user(user_id):
+    return int(user_id) % BUCKETS
+
+
+def bucket_for_order(order_id):
+    """Bucket encoded in an order id, or None for ids that predate sharding"""
+    order_id = int(order_id)
+    if order_id < _id_floor():
+        return None
+    return order_id & (BUCKETS - 1)
+
+
+def load_map(refresh=False):
+    """(bucket -> alias list, moving buckets), cached for ORDER_SHARD_MAP_TTL seconds"""
+    with _lock:
+        if refresh or _map['aliases'] is None \
+                or time.monotonic() - _map['loaded_at'] > settings.ORDER_SHARD_MAP_TTL:
+            rows = list(ShardBucket.objects.using(DEFAULT_DB_ALIAS).values_list('bucket', 'alias', 'moving'))
+            if len(rows) < BUCKETS:
+                # First start: spread buckets over the shards configured now.
+                # Later shards only receive buckets through rebalancing.
+                aliases = shard_aliases()
+                ShardBucket.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+                    [ShardBucket(bucket=bucket, alias=aliases[bucket % len(aliases)])
+                     for bucket in range(BUCKETS)],
+                    ignore_conflicts=True,
+                )
+                rows = list(ShardBucket.objects.using(DEFAULT_DB_ALIAS).values_list('bucket', 'alias', 'moving'))
+            aliases = [None] * BUCKETS
+            for bucket, alias, _ in rows:
+                aliases[bucket] = alias
+            _map['aliases'] = aliases
+            _map['moving'] = frozenset(bucket for bucket, _, moving in rows if moving)
+            _map['loaded_at'] = time.monotonic()
+        return _map['aliases'], _map['moving']
+
+
+def shard_for_bucket(bucket, write=False):
+    aliases, moving = load_map()
+    if write and bucket in moving:
+        raise ShardMoving('These orders are being moved to another database; retry shortly')
+    return aliases[bucket]
+
+
+def shard_for_user(user_id, write=False):
+    return shard_for_bucket(bucket_for_user(user_id), write=write)
+
+
+def locate_orders(order_ids):
+    """{order id: alias holding it}; pre-sharding ids no shard has are left out"""
+    located, unknown = {}, []
+    for order_id in order_ids:
+        bucket = bucket_for_order(order_id)
+        if bucket is None:
+            unknown.append(order_id)
+        else:
+            located[order_id] = shard_for_bucket(bucket)
+    # Pre-sharding ids do not say where they are
+    for alias in shard_aliases():
+        if not unknown:
+            break
+        for order_id in Order.objects.using(alias).filter(pk__in=unknown).values_list('pk', flat=True):
+            located[order_id] = alias
+        unknown = [order_id for order_id in unknown if order_id not in located]
+    return located
+
+
+def locate_order(order_id):
+    """Alias holding the order, or None if no shard has it"""
+    return locate_orders([order_id]).get(order_id)
+
+
+def _counter():
+    """The id counter row, created (with its sequence) above every existing id"""
+    counter = OrderIdBlock.objects.using(DEFAULT_DB_ALIAS).filter(name=ORDER_ID_COUNTER).first()
+    if counter is not None:
+        return counter
+    highest = max(
+        Order.objects.using(alias).aggregate(highest=Max('id'))['highest'] or 0
+        for alias in shard_aliases()
+    )
+    first_value = (highest >> BUCKET_BITS) + 1
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        OrderIdBlock.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+            [OrderIdBlock(name=ORDER_ID_COUNTER, next_value=first_value, first_value=first_value)],
+            ignore_conflicts=True,
+        )
+        counter = OrderIdBlock.objects.using(DEFAULT_DB_ALIAS).get(name=ORDER_ID_COUNTER)
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {ORDER_ID_SEQUENCE} '
+                               f'START WITH {int(counter.first_value)}')
+    return counter
+
+
+def setup_shards():
+    """Create the shard map and id counter; run after migrating 'default'"""
+    load_map(refresh=True)
+    _counter()
+
+
+def _next_value():
+    """The next counter value"""
+    if _ids['counter'] is None:
+        _ids['counter'] = _counter()
+        _ids['floor'] = _ids['counter'].first_value << BUCKET_BITS
+    counter = _ids['counter']
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor == 'postgresql':
+        # nextval() ignores rollbacks, so a value drawn inside a transaction
+        # that fails is never handed out again
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [ORDER_ID_SEQUENCE])
+            return cursor.fetchone()[0]
+    # Other databases (local test setups) count in the row, transactionally
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        counter = OrderIdBlock.objects.using(DEFAULT_DB_ALIAS).select_for_update().get(pk=counter.pk)
+        value = counter.next_value
+        counter.next_value = value + 1
+        counter.save(update_fields=['next_value'])
+    return value
+
+
+def _id_floor():
+    if _ids['floor'] is None:
+        counter = OrderIdBlock.objects.using(DEFAULT_DB_ALIAS).filter(name=ORDER_ID_COUNTER).first()
+        if counter is None:
+            return float('inf')  # nothing issued yet; every existing id predates sharding
+        _ids['floor'] = counter.first_value << BUCKET_BITS
+    return _ids['floor']
+
+
+def next_order_id(user_id):
+    """A new order id that encodes the user's bucket"""
+    return (_next_value() << BUCKET_BITS) | bucket_for_user(user_id)
@@ -0,0 +1,48 @@
+"""
+Compact order summaries for other services (GET /api/orders/<id>/summary/).
+
+A summary is the order's id, user, status, exact total and a version taken
+from updated_at; the version doubles as the ETag, so callers holding a
+summary revalidate with If-None-Match and get a bodiless 304 while the order
+is unchanged. Summaries are cached for ORDER_SUMMARY_CACHE_TTL seconds and
+dropped when a transaction that records an order event commits (see
+orders.outbox), which covers every write path.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Order
+from .sharding import locate_order
+
+
+def _key(order_id):
+    return f'order-summary:{order_id}'
+
+
+def order_summary(order_id):
+    """The order's summary dict, or None if it does not exist"""
+    summary = cache.get(_key(order_id))
+    if summary is None:
+        shard = locate_order(order_id)
+        row = Order.objects.using(shard).filter(pk=order_id).values(
+            'id', 'user_id', 'status', 'total_amount', 'updated_at'
+        ).first() if shard else None
+        if row is None:
+            return None
+        summary = {
+            'id': row['id'],
+            'user_id': row['user_id'],
+            'status': row['status'],
+            'total_amount': str(row['total_amount']),
+            'version': int(row['updated_at'].timestamp() * 1_000_000),
+        }
+        cache.set(_key(order_id), summary, settings.ORDER_SUMMARY_CACHE_TTL)
+    return summary
+
+
+def etag(summary):
+    return f'"{summary["id"]}-{summary["version"]}"'
+
+
+def forget_summaries(order_ids):
+    cache.delete_many([_key(order_id) for order_id in order_ids])
@@ -0,0 +1,87 @@
+"""
+Bulk order status transitions.
+
+All eligible orders of a shard move in one UPDATE ... WHERE id IN (...) AND
+status IN (statuses allowed to reach the target) RETURNING, so concurrent
+changes cannot slip an order through an invalid transition between a read and
+the write. Outbox events for the moved orders are written in the same
+transaction, and cancelled orders return their reserved stock once it commits.
+"""
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .models import Order
+from .outbox import record_order_events
+from .sharding import bucket_for_order, locate_orders, shard_for_bucket
+from .validation import release_on_commit
+
+
+def _transition_shard(shard, order_ids, new_status, allowed_from):
+    """The UPDATE for one shard's orders; returns {id: updated Order}"""
+    updated = {}
+    connection = connections[shard]
+    with transaction.atomic(using=shard):
+        table = connection.ops.quote_name(Order._meta.db_table)
+        id_params = ', '.join(['%s'] * len(order_ids))
+        status_params = ', '.join(['%s'] * len(allowed_from))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET status = %s, updated_at = %s '
+                f'WHERE id IN ({id_params}) AND status IN ({status_params}) '
+                'RETURNING id, user_id, total_amount, stock_reserved, created_at, updated_at',
+                [new_status, timezone.now(), *order_ids, *allowed_from]
+            )
+            for order_id, user_id, total_amount, stock_reserved, created_at, updated_at in cursor.fetchall():
+                order = Order(
+                    id=order_id, user_id=user_id, status=new_status, total_amount=total_amount,
+                    stock_reserved=stock_reserved, created_at=created_at, updated_at=updated_at,
+                )
+                order._state.db = shard
+                updated[order_id] = order
+        record_order_events(updated.values(), 'order.status_changed')
+        if new_status == 'CANCELLED':
+            release_on_commit(updated.values())
+    return updated
+
+
+def bulk_transition(order_ids, new_status):
+    """Move orders to new_status where the transition table allows it.
+
+    Returns one outcome per distinct id, in request order: `updated`, or an
+    `error` of not_found / already_in_status / invalid_transition (with the
+    order's current status). Each shard's orders move in their own
+    transaction; orders in a bucket that is being moved raise ShardMoving
+    before anything is written.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    by_shard = {}
+    for order_id, shard in locate_orders(order_ids).items():
+        bucket = bucket_for_order(order_id)
+        if bucket is not None:
+            shard_for_bucket(bucket, write=True)
+        by_shard.setdefault(shard, []).append(order_id)
+
+    allowed_from = Order.statuses_leading_to(new_status)
+    updated = {}
+    if allowed_from:
+        for shard, shard_ids in by_shard.items():
+            updated.update(_transition_shard(shard, shard_ids, new_status, allowed_from))
+
+    current = {}
+    for shard, shard_ids in by_shard.items():
+        missing = [order_id for order_id in shard_ids if order_id not in updated]
+        if missing:
+            current.update(Order.objects.using(shard).filter(pk__in=missing).values_list('pk', 'status'))
+    results = []
+    for order_id in order_ids:
+        if order_id in updated:
+            results.append({'id': order_id, 'updated': True})
+            continue
+        result = {'id': order_id, 'updated': False}
+        if order_id not in current:
+            result['error'] = 'not_found'
+        else:
+            result['status'] = current[order_id]
+            result['error'] = 'already_in_status' if current[order_id] == new_status else 'invalid_transition'
+        results.append(result)
+    return results
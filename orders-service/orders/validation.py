@@ -0,0 +1,160 @@
+"""
+Upstream validation and stock reservation for order creation.
+
+The user and book checks are independent, so they run concurrently on a
+shared thread pool under one deadline. The first check to fail decides the
+response; the others are cancelled (or, if already in flight, left to time
+out on their own with their results discarded).
+
+verify_and_reserve() is the whole sequence, shared by the synchronous
+create path and the async intake workers (orders.intake).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from rest_framework import status
+
+from . import clients
+from .models import OrderItem
+
+logger = logging.getLogger(__name__)
+
+
+_executor = ThreadPoolExecutor(
+    max_workers=settings.UPSTREAM_MAX_WORKERS, thread_name_prefix='upstream'
+)
+
+
+class ValidationFailed(Exception):
+    """An upstream check rejected the order; carries the API error response"""
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def check_user(user_id, timeout):
+    try:
+        response = clients.users.get(f'/api/users/{user_id}/', timeout=timeout)
+    except requests.RequestException:
+        raise ValidationFailed('Unable to verify user. Users service unavailable.',
+                               status.HTTP_503_SERVICE_UNAVAILABLE)
+    if response.status_code != 200:
+        raise ValidationFailed(f'User {user_id} not found', status.HTTP_404_NOT_FOUND)
+
+
+def fetch_books(book_ids, timeout):
+    """Return {str(book_id): book} for the books that exist (one bulk lookup)"""
+    try:
+        response = clients.books.post('/api/books/bulk/', json={'ids': book_ids}, timeout=timeout)
+        if response.status_code != 200:
+            raise ValidationFailed('Unable to verify books.', status.HTTP_503_SERVICE_UNAVAILABLE)
+        return response.json()['ids']
+    except (requests.RequestException, ValueError, KeyError):
+        raise ValidationFailed('Unable to verify book. Books service unavailable.',
+                               status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+def run_checks(checks, timeout=None):
+    """Run {name: (func, *args)} concurrently; return {name: result}.
+
+    All checks start together, each with the whole deadline as its ``timeout``.
+    Raises the first ValidationFailed to complete, or a 503 ValidationFailed
+    when the deadline passes first.
+    """
+    timeout = settings.ORDER_VALIDATION_TIMEOUT if timeout is None else timeout
+    futures = {
+        _executor.submit(func, *args, timeout=timeout): name
+        for name, (func, *args) in checks.items()
+    }
+    results = {}
+    try:
+        for future in as_completed(futures, timeout=timeout):
+            results[futures[future]] = future.result()
+    except FutureTimeout:
+        raise ValidationFailed('Timed out verifying the order. Please retry.',
+                               status.HTTP_503_SERVICE_UNAVAILABLE)
+    finally:
+        for future in futures:
+            future.cancel()
+    return results
+
+
+def price_items(items, books):
+    """Check stock and set each item's price from the books-service lookup"""
+    for item in items:
+        book_id = item['book_id']
+        book_data = books.get(str(book_id))
+        if book_data is None:
+            raise ValidationFailed(f'Book {book_id} not found', status.HTTP_404_NOT_FOUND)
+        if book_data.get('stock', 0) < item['quantity']:
+            raise ValidationFailed(f'Insufficient stock for book {book_id}',
+                                   status.HTTP_400_BAD_REQUEST)
+        item['price'] = book_data.get('price', 0)
+
+
+def reserve_stock(stock_items):
+    """Reserve stock atomically on books-service; price_items() only fails fast"""
+    try:
+        response = clients.books.post('/api/books/reserve/', json={'items': stock_items})
+    except requests.RequestException:
+        raise ValidationFailed('Unable to reserve stock. Books service unavailable.',
+                               status.HTTP_503_SERVICE_UNAVAILABLE)
+    if response.status_code == status.HTTP_409_CONFLICT:
+        book_id = next(
+            result['book_id'] for result in response.json()['items']
+            if result.get('error') != 'rolled_back'
+        )
+        raise ValidationFailed(f'Insufficient stock for book {book_id}',
+                               status.HTTP_400_BAD_REQUEST)
+    if response.status_code != 200:
+        raise ValidationFailed('Unable to reserve stock.', status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+def release_stock(stock_items):
+    """Best-effort return of reserved stock when an order could not be saved or was cancelled"""
+    try:
+        clients.books.post('/api/books/release/', json={'items': stock_items})
+    except requests.RequestException:
+        logger.exception('Failed to release stock for %s', stock_items)
+
+
+def release_on_commit(orders):
+    """Return the stock reserved for orders being cancelled once the transaction commits.
+
+    Call inside the transaction that cancels them, with orders of one shard.
+    """
+    orders = [order for order in orders if order.stock_reserved]
+    if not orders:
+        return
+    using = orders[0]._state.db
+    created = [order.created_at for order in orders]
+    quantities = {}
+    for book_id, quantity in OrderItem.objects.using(using).filter(
+        order_id__in=[order.id for order in orders],
+        order_created_at__range=(min(created), max(created)),
+    ).values_list('book_id', 'quantity'):
+        quantities[book_id] = quantities.get(book_id, 0) + quantity
+    stock_items = [{'book_id': book_id, 'quantity': quantity}
+                   for book_id, quantity in sorted(quantities.items())]
+    transaction.on_commit(lambda: release_stock(stock_items), using=using)
+
+
+def verify_and_reserve(user_id, items):
+    """Verify the user and books, price `items` in place and reserve their stock.
+
+    Returns the reserved stock items; pass them to release_stock() if the
+    order is not saved after all. Raises ValidationFailed.
+    """
+    books = run_checks({
+        'user': (check_user, user_id),
+        'books': (fetch_books, [item['book_id'] for item in items]),
+    })['books']
+    price_items(items, books)
+    stock_items = [{'book_id': item['book_id'], 'quantity': item['quantity']} for item in items]
+    reserve_stock(stock_items)
+    return stock_items
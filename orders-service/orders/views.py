@@ -1,98 +1,332 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.conf import settings
-import requests
-from .models import Order, OrderItem
-from .serializers import OrderSerializer, OrderCreateSerializer
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Prefetch, Sum, prefetch_related_objects
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .idempotency import idempotent_response
+from .intake import enqueue_order
+from .models import DailyBookSales, DailySales, Order, OrderItem
+from .outbox import events_after, record_order_event, serialize_event
+from .pagination import OrderCursorPagination
+from .rollups import EXCLUDED_STATUSES
+from .serializers import OrderSerializer, OrderCreateSerializer, OrderStatusBulkSerializer
+from .sharding import ShardMoving, locate_order, shard_aliases, shard_for_user
+from .summaries import etag, order_summary
+from .transitions import bulk_transition
+from .validation import ValidationFailed, release_on_commit, release_stock, verify_and_reserve
+
+
+SALES_DEFAULT_DAYS = 30
+SALES_MAX_DAYS = 366
+
+
+def money(value):
+    """Render a rollup amount like the serializers' DecimalFields do"""
+    return str(Decimal(str(value or 0)).quantize(Decimal('0.01')))
+
+
+def sales_range(request):
+    """Parse ?start=&end= (inclusive dates); returns (start, end, error response)"""
+    today = timezone.localdate()
+    try:
+        end = parse_date(request.query_params['end']) if 'end' in request.query_params else today
+        start = (parse_date(request.query_params['start']) if 'start' in request.query_params
+                 else end - timedelta(days=SALES_DEFAULT_DAYS - 1))
+    except ValueError:
+        start = end = None
+    if start is None or end is None:
+        return None, None, Response({'error': 'start and end must be YYYY-MM-DD dates'},
+                                    status=status.HTTP_400_BAD_REQUEST)
+    if start > end or (end - start).days >= SALES_MAX_DAYS:
+        return None, None, Response(
+            {'error': f'start must not be after end, and the range at most {SALES_MAX_DAYS} days'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return start, end, None
+
+
+def prefetch_items(orders):
+    """Load the orders' items, one query per shard bounded on the items' partition key"""
+    orders = list(orders)
+    by_shard = {}
+    for order in orders:
+        by_shard.setdefault(order._state.db, []).append(order)
+    for shard, shard_orders in by_shard.items():
+        created = [order.created_at for order in shard_orders]
+        items = OrderItem.objects.using(shard).filter(
+            order_created_at__range=(min(created), max(created))
+        )
+        prefetch_related_objects(shard_orders, Prefetch('items', queryset=items))
+    return orders
 
 
 class OrderViewSet(viewsets.ModelViewSet):
     """ViewSet for Order CRUD operations"""
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    pagination_class = OrderCursorPagination
 
     def get_serializer_class(self):
         if self.action == 'create':
             return OrderCreateSerializer
         return OrderSerializer
 
+    # Actions that check an order's status and write it; they run on the locked row
+    LOCKING_ACTIONS = {'update', 'partial_update', 'update_status'}
+
+    def get_queryset(self):
+        """Orders on the shard the looked-up id belongs to (see orders.sharding)"""
+        order_id = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if order_id is not None and str(order_id).isdigit():
+            orders = Order.objects.using(locate_order(int(order_id)) or DEFAULT_DB_ALIAS)
+            if self.action in self.LOCKING_ACTIONS:
+                orders = orders.select_for_update()
+            return orders
+        return super().get_queryset()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, ShardMoving):
+            return Response({'error': str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={'Retry-After': '5'})
+        return super().handle_exception(exc)
+
+    def update(self, request, *args, **kwargs):
+        """Validate and save against the locked order, so concurrent changes cannot interleave"""
+        with transaction.atomic(using=self.get_queryset().db):
+            return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        cancelled = serializer.instance.status != 'CANCELLED' \
+            and serializer.validated_data.get('status') == 'CANCELLED'
+        with transaction.atomic(using=serializer.instance._state.db):
+            order = serializer.save()
+            record_order_event(order, 'order.updated')
+            if cancelled:
+                release_on_commit([order])
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(using=instance._state.db):
+            record_order_event(instance, 'order.deleted')
+            instance.delete()
+
+    def filter_orders(self, request, orders):
+        """Apply the optional user_id/status/created_after/created_before filters.
+
+        Returns (orders, error response). The date bounds (inclusive UTC days)
+        limit the scan to the matching monthly partitions.
+        """
+        user_id = request.query_params.get('user_id')
+        if user_id is not None:
+            if not user_id.isdigit():
+                return None, Response({'error': 'user_id must be an integer'},
+                                      status=status.HTTP_400_BAD_REQUEST)
+            orders = orders.filter(user_id=user_id)
+        order_status = request.query_params.get('status')
+        if order_status is not None:
+            if order_status not in dict(Order.STATUS_CHOICES):
+                return None, Response({'error': 'Invalid status'},
+                                      status=status.HTTP_400_BAD_REQUEST)
+            orders = orders.filter(status=order_status)
+        for param, lookup, offset in (('created_after', 'created_at__gte', 0),
+                                      ('created_before', 'created_at__lt', 1)):
+            if param not in request.query_params:
+                continue
+            try:
+                day = parse_date(request.query_params[param])
+            except ValueError:
+                day = None
+            if day is None:
+                return None, Response({'error': f'{param} must be a YYYY-MM-DD date'},
+                                      status=status.HTTP_400_BAD_REQUEST)
+            bound = timezone.make_aware(datetime.combine(day + timedelta(days=offset), time.min))
+            orders = orders.filter(**{lookup: bound})
+        return orders, None
+
+    def paginated_response(self, orders):
+        """One page of orders plus their items in two queries per shard, whatever the page size.
+
+        A user's orders are on one shard; other listings merge every shard's page.
+        """
+        user_id = self.request.query_params.get('user_id')
+        if user_id is not None:
+            shards = [shard_for_user(user_id)]
+        else:
+            shards = shard_aliases()
+        page = prefetch_items(self.paginator.paginate_shards(
+            [orders.using(shard) for shard in shards], self.request, view=self
+        ))
+        return self.get_paginated_response(OrderSerializer(page, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        order, = prefetch_items([self.get_object()])
+        return Response(OrderSerializer(order).data)
+
+    def list(self, request, *args, **kwargs):
+        """List orders, optionally filtered by user_id, status and creation dates"""
+        orders, error = self.filter_orders(request, self.get_queryset())
+        if error:
+            return error
+        return self.paginated_response(orders)
+
     def create(self, request, *args, **kwargs):
+        """Create a new order; retries carrying the same Idempotency-Key replay the first response"""
+        user_id = str(request.data.get('user_id', ''))
+        shard = shard_for_user(user_id, write=True) if user_id.isdigit() else DEFAULT_DB_ALIAS
+        return idempotent_response(request, lambda: self.create_order(request), shard)
+
+    def create_order(self, request):
         """Create a new order with validation"""
         serializer = OrderCreateSerializer(data=request.data)
         if serializer.is_valid():
-            # Validate user exists
-            user_id = serializer.validated_data['user_id']
+            if settings.ORDER_INTAKE_MODE == 'async':
+                # Prices are provisional until a worker confirms the order
+                order = enqueue_order(serializer)
+                return Response(OrderSerializer(order).data, status=status.HTTP_202_ACCEPTED)
+
+            # Verify the user and every book concurrently, then reserve stock
             try:
-                user_response = requests.get(
-                    f"{settings.USERS_SERVICE_URL}/api/users/{user_id}/",
-                    timeout=5
-                )
-                if user_response.status_code != 200:
-                    return Response(
-                        {'error': f'User {user_id} not found'},
-                        status=status.HTTP_404_NOT_FOUND
-                    )
-            except requests.RequestException:
-                return Response(
-                    {'error': 'Unable to verify user. Users service unavailable.'},
-                    status=status.HTTP_503_SERVICE_UNAVAILABLE
+                stock_items = verify_and_reserve(
+                    serializer.validated_data['user_id'], serializer.validated_data['items']
                 )
+            except ValidationFailed as exc:
+                return Response({'error': exc.message}, status=exc.status_code)
 
-            # Validate books exist and check stock
-            items_data = serializer.validated_data['items']
-            for item in items_data:
-                book_id = item['book_id']
-                quantity = item['quantity']
-                try:
-                    book_response = requests.get(
-                        f"{settings.BOOKS_SERVICE_URL}/api/books/{book_id}/",
-                        timeout=5
-                    )
-                    if book_response.status_code != 200:
-                        return Response(
-                            {'error': f'Book {book_id} not found'},
-                            status=status.HTTP_404_NOT_FOUND
-                        )
-                    book_data = book_response.json()
-                    if book_data.get('stock', 0) < quantity:
-                        return Response(
-                            {'error': f'Insufficient stock for book {book_id}'},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-                    item['price'] = book_data.get('price', 0)
-                except requests.RequestException:
-                    return Response(
-                        {'error': 'Unable to verify book. Books service unavailable.'},
-                        status=status.HTTP_503_SERVICE_UNAVAILABLE
-                    )
-
-            order = serializer.save()
+            try:
+                # Checked, priced and reserved: what an intake worker confirms
+                order = serializer.save(status='CONFIRMED', stock_reserved=True)
+            except Exception:
+                release_stock(stock_items)
+                raise
             return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'])
     def by_user(self, request):
         """Get orders by user ID"""
-        user_id = request.query_params.get('user_id')
-        if user_id:
-            orders = Order.objects.filter(user_id=user_id)
-            serializer = self.get_serializer(orders, many=True)
-            return Response(serializer.data)
+        if request.query_params.get('user_id'):
+            orders, error = self.filter_orders(request, self.get_queryset())
+            if error:
+                return error
+            return self.paginated_response(orders)
         return Response({'error': 'user_id parameter required'}, 
                        status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['patch'])
     def update_status(self, request, pk=None):
         """Update order status"""
-        order = self.get_object()
         new_status = request.data.get('status')
         if new_status not in dict(Order.STATUS_CHOICES):
             return Response(
                 {'error': 'Invalid status'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        order.status = new_status
-        order.save()
+        with transaction.atomic(using=self.get_queryset().db):
+            order = self.get_object()
+            if new_status != order.status and not order.can_transition(new_status):
+                return Response(
+                    {'error': f'Cannot change status from {order.status} to {new_status}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            cancelled = order.status != 'CANCELLED' and new_status == 'CANCELLED'
+            order.status = new_status
+            order.save(update_fields=['status', 'updated_at'])
+            record_order_event(order, 'order.status_changed')
+            if cancelled:
+                release_on_commit([order])
         return Response(OrderSerializer(order).data)
 
+    @action(detail=True, methods=['get'])
+    def summary(self, request, pk=None):
+        """Id, user, status, exact total and version only; answers If-None-Match with 304"""
+        summary = order_summary(int(pk)) if str(pk).isdigit() else None
+        if summary is None:
+            return Response({'error': 'Order not found'}, status=status.HTTP_404_NOT_FOUND)
+        tag = etag(summary)
+        headers = {'ETag': tag, 'Cache-Control': 'private, no-cache'}
+        if tag in [value.strip() for value in request.headers.get('If-None-Match', '').split(',')]:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(summary, headers=headers)
+
+    @action(detail=False, methods=['post'])
+    def bulk_status(self, request):
+        """Move many orders to one status in a single UPDATE; reports each order's outcome"""
+        serializer = OrderStatusBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        results = bulk_transition(serializer.validated_data['ids'], serializer.validated_data['status'])
+        return Response({
+            'status': serializer.validated_data['status'],
+            'updated': sum(1 for result in results if result['updated']),
+            'results': results,
+        })
+
+    @action(detail=False, methods=['get'])
+    def events(self, request):
+        """Order change events after a position (the consumer's cursor), oldest first"""
+        try:
+            after = int(request.query_params.get('after', 0))
+            limit = max(1, min(int(request.query_params.get('limit', 500)), 1000))
+        except ValueError:
+            return Response({'error': 'after and limit must be integers'},
+                           status=status.HTTP_400_BAD_REQUEST)
+        events = [serialize_event(event) for event in events_after(after, limit)]
+        return Response({
+            'events': events,
+            'next_after': events[-1]['position'] if events else after,
+        })
+
+
+class SalesViewSet(viewsets.ViewSet):
+    """Dashboard queries answered from the daily rollups (see orders.rollups)"""
+
+    @action(detail=False, methods=['get'])
+    def daily(self, request):
+        """Orders and revenue per day, with a per-status breakdown"""
+        start, end, error = sales_range(request)
+        if error:
+            return error
+        days = {}
+        for row in DailySales.objects.filter(day__range=(start, end)).order_by('day', 'status'):
+            day = days.setdefault(row.day, {'day': row.day, 'orders': 0, 'revenue': 0, 'by_status': {}})
+            day['by_status'][row.status] = {'orders': row.orders, 'revenue': money(row.revenue)}
+            day['orders'] += row.orders
+            if row.status not in EXCLUDED_STATUSES:
+                day['revenue'] += row.revenue
+        for day in days.values():
+            day['revenue'] = money(day['revenue'])
+        return Response({'start': start, 'end': end, 'days': list(days.values())})
+
+    @action(detail=False, methods=['get'])
+    def books(self, request):
+        """Top books by units over a range, or one book's daily series with ?book_id="""
+        start, end, error = sales_range(request)
+        if error:
+            return error
+        rows = DailyBookSales.objects.filter(day__range=(start, end))
+        book_id = request.query_params.get('book_id')
+        if book_id:
+            if not book_id.isdigit():
+                return Response({'error': 'book_id must be an integer'},
+                               status=status.HTTP_400_BAD_REQUEST)
+            series = rows.filter(book_id=book_id).order_by('day').values('day', 'units', 'revenue', 'orders')
+            return Response({'start': start, 'end': end, 'book_id': int(book_id), 'days': [
+                {**row, 'revenue': money(row['revenue'])} for row in series
+            ]})
+
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'},
+                           status=status.HTTP_400_BAD_REQUEST)
+        top = rows.order_by().values('book_id').annotate(
+            units=Sum('units'), revenue=Sum('revenue'), orders=Sum('orders')
+        ).order_by('-units', 'book_id')[:limit]
+        return Response({'start': start, 'end': end, 'books': [
+            {**row, 'revenue': money(row['revenue'])} for row in top
+        ]})
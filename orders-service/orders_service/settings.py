@@ -3,7 +3,8 @@ Django settings for orders_service project.
 """
 
 from pathlib import Path
-from decouple import config
+from corsheaders.defaults import default_headers
+from decouple import Csv, config
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -58,7 +59,7 @@ WSGI_APPLICATION = 'orders_service.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': config('DB_ENGINE', default='django.db.backends.postgresql'),
         'NAME': config('DB_NAME', default='orders_db'),
         'USER': config('DB_USER', default='postgres'),
         'PASSWORD': config('DB_PASSWORD', default='postgres'),
@@ -67,6 +68,47 @@ DATABASES = {
     }
 }
 
+# Cache settings: Redis when REDIS_HOST is set, per-process memory otherwise
+REDIS_HOST = config('REDIS_HOST', default='')
+REDIS_PORT = config('REDIS_PORT', default='6379')
+
+if REDIS_HOST:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/0',
+            'KEY_PREFIX': 'orders-service',
+            'OPTIONS': {
+                'socket_connect_timeout': 0.25,
+                'socket_timeout': 0.25,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds an order summary (orders.summaries) may be served from the cache
+ORDER_SUMMARY_CACHE_TTL = config('ORDER_SUMMARY_CACHE_TTL', default=5, cast=int)
+
+# Order shards (orders.sharding): 'default' plus the aliases in ORDER_SHARDS,
+# each configured by <ALIAS>_DB_NAME/_USER/_PASSWORD/_HOST/_PORT, falling
+# back to the DB_* values
+ORDER_SHARDS = ['default'] + [alias for alias in config('ORDER_SHARDS', default='', cast=Csv())
+                              if alias != 'default']
+for alias in ORDER_SHARDS[1:]:
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        **{key: config(f'{alias.upper()}_DB_{key}', default=DATABASES['default'][key])
+           for key in ('NAME', 'USER', 'PASSWORD', 'HOST', 'PORT')},
+    }
+DATABASE_ROUTERS = ['orders.routers.OrderShardRouter']
+# Seconds a process trusts its cached bucket -> shard map
+ORDER_SHARD_MAP_TTL = config('ORDER_SHARD_MAP_TTL', default=5.0, cast=float)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -101,6 +143,50 @@ REST_FRAMEWORK = {
 USERS_SERVICE_URL = config('USERS_SERVICE_URL', default='http://users-service:8001')
 BOOKS_SERVICE_URL = config('BOOKS_SERVICE_URL', default='http://books-service:8002')
 
+# Concurrent upstream checks on order creation (orders.validation)
+UPSTREAM_MAX_WORKERS = config('UPSTREAM_MAX_WORKERS', default=16, cast=int)
+ORDER_VALIDATION_TIMEOUT = config('ORDER_VALIDATION_TIMEOUT', default=5.0, cast=float)
+
+# Idempotency-Key on order creation (orders.idempotency): replay window and
+# how long a duplicate waits for the in-flight original, in seconds
+ORDER_IDEMPOTENCY_TTL = config('ORDER_IDEMPOTENCY_TTL', default=86400, cast=int)
+ORDER_IDEMPOTENCY_WAIT = config('ORDER_IDEMPOTENCY_WAIT', default=15.0, cast=float)
+
+# Order intake (orders.intake): 'sync' validates in the request, 'async' answers 202
+# and leaves validation to `manage.py process_order_intake` workers
+ORDER_INTAKE_MODE = config('ORDER_INTAKE_MODE', default='sync')
+ORDER_INTAKE_WORKERS = config('ORDER_INTAKE_WORKERS', default=4, cast=int)
+ORDER_INTAKE_POLL_INTERVAL = config('ORDER_INTAKE_POLL_INTERVAL', default=1.0, cast=float)
+ORDER_INTAKE_MAX_ATTEMPTS = config('ORDER_INTAKE_MAX_ATTEMPTS', default=5, cast=int)
+
+# Order event outbox (orders.outbox): push subscribers as name=url pairs, and how
+# long acknowledged events are kept for pull consumers
+ORDER_EVENT_SUBSCRIBERS = dict(
+    subscriber.split('=', 1) for subscriber in config(
+        'ORDER_EVENT_SUBSCRIBERS',
+        default='payments=http://payments-service:8004/api/payments/order_events/',
+        cast=Csv()
+    )
+)
+ORDER_EVENT_RETENTION_DAYS = config('ORDER_EVENT_RETENTION_DAYS', default=7, cast=int)
+# Sent with every pushed batch; subscribers reject batches without it
+ORDER_EVENT_RELAY_SECRET = config('ORDER_EVENT_RELAY_SECRET', default='')
+
+# Monthly order partitions (orders.partitions): how far ahead they are created,
+# and how old a month must be before it is archived
+ORDER_PARTITION_MONTHS_AHEAD = config('ORDER_PARTITION_MONTHS_AHEAD', default=3, cast=int)
+ORDER_PARTITION_RETENTION_MONTHS = config('ORDER_PARTITION_RETENTION_MONTHS', default=24, cast=int)
+
+# Inter-service HTTP client (service_client): keep-alive pools, GET retries, circuit breaker
+SERVICE_CLIENT = {
+    'TIMEOUT': config('SERVICE_CLIENT_TIMEOUT', default=5.0, cast=float),
+    'POOL_MAXSIZE': config('SERVICE_CLIENT_POOL_MAXSIZE', default=20, cast=int),
+    'RETRIES': config('SERVICE_CLIENT_RETRIES', default=2, cast=int),
+    'BACKOFF': config('SERVICE_CLIENT_BACKOFF', default=0.1, cast=float),
+    'FAILURE_THRESHOLD': config('SERVICE_CLIENT_FAILURE_THRESHOLD', default=5, cast=int),
+    'RESET_TIMEOUT': config('SERVICE_CLIENT_RESET_TIMEOUT', default=30.0, cast=float),
+}
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -108,4 +194,5 @@ CORS_ALLOWED_ORIGINS = [
 ]
 CORS_ALLOW_ALL_ORIGINS = config('CORS_ALLOW_ALL_ORIGINS', default=False, cast=bool)
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
@@ -4,14 +4,26 @@ URL configuration for orders_service project.
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
+from orders.intake import queue_stats
+from orders.service_client import client_stats
 
 def health_check(request):
     """Health check endpoint for Kubernetes probes"""
     return JsonResponse({'status': 'healthy', 'service': 'orders-service'})
 
+def service_client_stats(request):
+    """Connection pool and circuit breaker state for this process's upstream clients"""
+    return JsonResponse(client_stats())
+
+def intake_stats(request):
+    """Depth and age of the async order intake queue"""
+    return JsonResponse(queue_stats())
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('orders.urls')),
     path('health', health_check, name='health'),
+    path('client-stats', service_client_stats, name='client-stats'),
+    path('intake-stats', intake_stats, name='intake-stats'),
 ]
 
@@ -0,0 +1,4 @@
+from django.conf import settings
+from .service_client import ServiceClient
+
+orders = ServiceClient('orders', settings.ORDERS_SERVICE_URL)
@@ -18,7 +18,7 @@ class Payment(models.Model):
         ('REFUNDED', 'Refunded'),
     ]
 
-    order_id = models.IntegerField()  # Reference to Orders service
+    order_id = models.BigIntegerField()  # Reference to Orders service
     user_id = models.IntegerField()  # Reference to Users service
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES)
@@ -33,3 +33,16 @@ class Payment(models.Model):
     class Meta:
         ordering = ['-payment_date']
 
+
+class OrderProjection(models.Model):
+    """Local copy of an order's state, kept current from orders-service events"""
+    order_id = models.BigIntegerField(unique=True)
+    user_id = models.IntegerField()
+    status = models.CharField(max_length=20)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    deleted = models.BooleanField(default=False)
+    # Position of the last applied event; redelivered or older events are skipped
+    position = models.BigIntegerField()
+
+    def __str__(self):
+        return f"Order {self.order_id} - {self.status} (event {self.position})"
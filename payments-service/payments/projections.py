@@ -0,0 +1,34 @@
+"""
+Local projection of orders-service state, fed by its event relay.
+
+Events arrive at least once and may be redelivered, so each is applied only
+if it is newer than the position already stored for its order.
+"""
+from django.db import transaction
+
+from .models import OrderProjection
+
+
+def apply_order_events(events):
+    """Apply validated OrderEventSerializer data; returns how many changed a projection"""
+    applied = 0
+    with transaction.atomic():
+        for event in sorted(events, key=lambda event: event['position']):
+            payload = event['payload']
+            state = {
+                'user_id': payload['user_id'],
+                'status': payload['status'],
+                'total_amount': payload['total_amount'],
+                'deleted': event['event_type'] == 'order.deleted',
+                'position': event['position'],
+            }
+            updated = OrderProjection.objects.filter(
+                order_id=event['order_id'], position__lt=event['position']
+            ).update(**state)
+            if not updated:
+                _, created = OrderProjection.objects.get_or_create(
+                    order_id=event['order_id'], defaults=state
+                )
+                updated = int(created)
+            applied += updated
+    return applied
@@ -23,3 +23,19 @@ class PaymentCreateSerializer(serializers.ModelSerializer):
         )
         return payment
 
+
+class OrderEventPayloadSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField()
+    status = serializers.CharField(max_length=20)
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+class OrderEventSerializer(serializers.Serializer):
+    position = serializers.IntegerField(min_value=1)
+    event_type = serializers.CharField(max_length=50)
+    order_id = serializers.IntegerField()
+    payload = OrderEventPayloadSerializer()
+
+
+class OrderEventBatchSerializer(serializers.Serializer):
+    events = OrderEventSerializer(many=True, max_length=1000)
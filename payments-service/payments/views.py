@@ -1,10 +1,43 @@
+import hmac
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.conf import settings
 import requests
-from .models import Payment
-from .serializers import PaymentSerializer, PaymentCreateSerializer
+from . import clients
+from .models import OrderProjection, Payment
+from .projections import apply_order_events
+from .serializers import OrderEventBatchSerializer, PaymentSerializer, PaymentCreateSerializer
+
+
+def fetch_order(order_id):
+    """Order state from the local projection, falling back to orders-service; None if missing.
+
+    The fallback asks for the order's summary only and revalidates a summary
+    fetched earlier with If-None-Match, so an unchanged order costs a 304.
+    """
+    projection = OrderProjection.objects.filter(order_id=order_id).first()
+    if projection is not None:
+        return None if projection.deleted else {
+            'status': projection.status, 'total_amount': projection.total_amount,
+        }
+    key = f'order-summary:{order_id}'
+    cached = cache.get(key)
+    headers = {'If-None-Match': cached['etag']} if cached else {}
+    order_response = clients.orders.get(f'/api/orders/{order_id}/summary/', headers=headers)
+    if order_response.status_code == 304 and cached:
+        return cached['summary']
+    if order_response.status_code != 200:
+        cache.delete(key)
+        return None
+    summary = order_response.json()
+    if order_response.headers.get('ETag'):
+        cache.set(key, {'etag': order_response.headers['ETag'], 'summary': summary},
+                  settings.ORDER_SUMMARY_CACHE_TIMEOUT)
+    return summary
 
 
 class PaymentViewSet(viewsets.ModelViewSet):
@@ -25,19 +58,23 @@ class PaymentViewSet(viewsets.ModelViewSet):
             
             # Validate order exists
             try:
-                order_response = requests.get(
-                    f"{settings.ORDERS_SERVICE_URL}/api/orders/{order_id}/",
-                    timeout=5
-                )
-                if order_response.status_code != 200:
+                order_data = fetch_order(order_id)
+                if order_data is None:
                     return Response(
                         {'error': f'Order {order_id} not found'},
                         status=status.HTTP_404_NOT_FOUND
                     )
-                order_data = order_response.json()
                 
+                # Async orders carry the client's prices until a worker confirms them
+                if order_data.get('status') != 'CONFIRMED':
+                    return Response(
+                        {'error': f"Order {order_id} is {order_data.get('status')}; "
+                                  'only CONFIRMED orders can be paid'},
+                        status=status.HTTP_409_CONFLICT
+                    )
+
                 # Verify payment amount matches order total
-                if float(serializer.validated_data['amount']) != float(order_data.get('total_amount', 0)):
+                if serializer.validated_data['amount'] != Decimal(str(order_data.get('total_amount', 0))):
                     return Response(
                         {'error': 'Payment amount does not match order total'},
                         status=status.HTTP_400_BAD_REQUEST
@@ -94,3 +131,15 @@ class PaymentViewSet(viewsets.ModelViewSet):
         payment.save()
         return Response(PaymentSerializer(payment).data)
 
+    @action(detail=False, methods=['post'])
+    def order_events(self, request):
+        """Receive a batch of order events from the orders-service relay"""
+        secret = request.headers.get('X-Order-Events-Secret', '')
+        if not settings.ORDER_EVENT_RELAY_SECRET \
+                or not hmac.compare_digest(secret, settings.ORDER_EVENT_RELAY_SECRET):
+            return Response({'error': 'Invalid relay secret'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = OrderEventBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        applied = apply_order_events(serializer.validated_data['events'])
+        return Response({'applied': applied})
@@ -100,6 +100,23 @@ REST_FRAMEWORK = {
 # External service URLs
 ORDERS_SERVICE_URL = config('ORDERS_SERVICE_URL', default='http://orders-service:8003')
 
+# Shared with the orders-service relay; order event pushes without it are
+# rejected, and all of them are while it is unset
+ORDER_EVENT_RELAY_SECRET = config('ORDER_EVENT_RELAY_SECRET', default='')
+
+# Seconds payments keeps an order summary (with its ETag) for revalidation
+ORDER_SUMMARY_CACHE_TIMEOUT = config('ORDER_SUMMARY_CACHE_TIMEOUT', default=300, cast=int)
+
+# Inter-service HTTP client (service_client): keep-alive pools, GET retries, circuit breaker
+SERVICE_CLIENT = {
+    'TIMEOUT': config('SERVICE_CLIENT_TIMEOUT', default=5.0, cast=float),
+    'POOL_MAXSIZE': config('SERVICE_CLIENT_POOL_MAXSIZE', default=20, cast=int),
+    'RETRIES': config('SERVICE_CLIENT_RETRIES', default=2, cast=int),
+    'BACKOFF': config('SERVICE_CLIENT_BACKOFF', default=0.1, cast=float),
+    'FAILURE_THRESHOLD': config('SERVICE_CLIENT_FAILURE_THRESHOLD', default=5, cast=int),
+    'RESET_TIMEOUT': config('SERVICE_CLIENT_RESET_TIMEOUT', default=30.0, cast=float),
+}
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
@@ -4,14 +4,20 @@ URL configuration for payments_service project.
 from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
+from payments.service_client import client_stats
 
 def health_check(request):
     """Health check endpoint for Kubernetes probes"""
     return JsonResponse({'status': 'healthy', 'service': 'payments-service'})
 
+def service_client_stats(request):
+    """Connection pool and circuit breaker state for this process's upstream clients"""
+    return JsonResponse(client_stats())
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('payments.urls')),
     path('health', health_check, name='health'),
+    path('client-stats', service_client_stats, name='client-stats'),
 ]
 
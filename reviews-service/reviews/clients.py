@@ -0,0 +1,5 @@
+from django.conf import settings
+from .service_client import ServiceClient
+
+users = ServiceClient('users', settings.USERS_SERVICE_URL)
+books = ServiceClient('books', settings.BOOKS_SERVICE_URL)
@@ -0,0 +1,69 @@
+"""
+Conditional GET support (ETag / Last-Modified).
+
+Validators come from a MAX(updated_at)/COUNT aggregate over the rows a
+response is built from, so a 304 is answered without rendering the body.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def queryset_validators(querysets, *salt):
+    """Return (etag, last_modified timestamp, row count) for a set of querysets"""
+    parts = [str(value) for value in salt]
+    last_modified = None
+    total = 0
+    for queryset in querysets:
+        state = queryset.order_by().aggregate(last_modified=Max('updated_at'), count=Count('pk'))
+        parts.extend([str(state['count']), str(state['last_modified'])])
+        total += state['count']
+        if state['last_modified'] and (last_modified is None or state['last_modified'] > last_modified):
+            last_modified = state['last_modified']
+    etag = 'W/' + quote_etag(hashlib.md5('|'.join(parts).encode()).hexdigest())
+    return etag, int(last_modified.timestamp()) if last_modified else None, total
+
+
+class ConditionalGetMixin:
+    """Answer If-None-Match / If-Modified-Since with 304 on list and retrieve"""
+
+    def get_validator_querysets(self):
+        if self.action == 'retrieve':
+            lookup = self.lookup_url_kwarg or self.lookup_field
+            return [self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup]})]
+        return [self.filter_queryset(self.get_queryset())]
+
+    def conditional_response(self, request, get_querysets, loader, allow_empty=True):
+        try:
+            etag, last_modified, count = queryset_validators(
+                get_querysets(), request.get_full_path(), request.accepted_media_type
+            )
+        except (TypeError, ValueError):
+            # Malformed lookup values; let the regular handler produce the error
+            return loader()
+        if not count and not allow_empty:
+            return loader()
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = loader()
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        parent = super()
+        return self.conditional_response(
+            request, self.get_validator_querysets,
+            lambda: parent.retrieve(request, *args, **kwargs), allow_empty=False
+        )
+
+    def list(self, request, *args, **kwargs):
+        parent = super()
+        return self.conditional_response(
+            request, self.get_validator_querysets,
+            lambda: parent.list(request, *args, **kwargs)
+        )
@@ -0,0 +1,61 @@
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reviews import clients
+from reviews.models import PendingBookRating, Review
+from reviews.ratings import rating_summaries
+
+
+class Command(BaseCommand):
+    help = 'Push queued rating summaries to books-service in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, polling the queue every --interval seconds')
+        parser.add_argument('--interval', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        while True:
+            pushed = self.drain(options['batch_size'])
+            if pushed:
+                self.stdout.write(f'Pushed {pushed} rating summaries')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        pushed = 0
+        while True:
+            as_of = timezone.now()
+            book_ids = list(PendingBookRating.objects.filter(marked_at__lte=as_of).order_by(
+                'marked_at'
+            ).values_list('book_id', flat=True)[:batch_size])
+            if not book_ids:
+                return pushed
+
+            summaries = {s['book_id']: s for s in rating_summaries(Review.objects.filter(book_id__in=book_ids))}
+            ratings = [
+                summaries.get(book_id, {'book_id': book_id, 'average_rating': '0.00', 'review_count': 0})
+                for book_id in book_ids
+            ]
+            try:
+                response = clients.books.post(
+                    '/api/books/ratings/',
+                    json={'as_of': as_of.isoformat(), 'ratings': ratings},
+                    headers={'X-Book-Ratings-Secret': settings.BOOK_RATINGS_PUSH_SECRET},
+                    timeout=10
+                )
+                response.raise_for_status()
+            except requests.RequestException as exc:
+                # Leave the queue intact; the next run retries
+                self.stderr.write(f'Rating push failed: {exc}')
+                return pushed
+
+            # Rows re-marked after as_of stay queued for the next batch
+            PendingBookRating.objects.filter(book_id__in=book_ids, marked_at__lte=as_of).delete()
+            pushed += len(ratings)
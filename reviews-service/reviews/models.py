@@ -25,3 +25,15 @@ class Review(models.Model):
         unique_together = ['book_id', 'user_id']  # One review per user per book
         ordering = ['-created_at']
 
+
+class PendingBookRating(models.Model):
+    """Books whose rating summary must be pushed to books-service.
+
+    Written by reviews.signals on every review change and drained in
+    batches by `manage.py push_book_ratings`.
+    """
+    book_id = models.IntegerField(unique=True)
+    marked_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Pending rating push for Book {self.book_id}"
@@ -0,0 +1,33 @@
+"""
+Rating summaries shared with books-service (Book.average_rating/review_count).
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db.models import Avg, Count
+from django.utils import timezone
+
+from .models import PendingBookRating
+
+
+def rating_summaries(reviews):
+    """Per-book (average, count) summaries for a Review queryset, ordered by book_id"""
+    rows = reviews.order_by().values('book_id').annotate(
+        avg_rating=Avg('rating'), total_reviews=Count('id')
+    ).order_by('book_id')
+    return [
+        {
+            'book_id': row['book_id'],
+            'average_rating': str(Decimal(row['avg_rating']).quantize(Decimal('0.01'), ROUND_HALF_UP)),
+            'review_count': row['total_reviews'],
+        }
+        for row in rows
+    ]
+
+
+def mark_books(*book_ids):
+    """Queue books for the next rating push (coalesces repeated changes)"""
+    now = timezone.now()
+    PendingBookRating.objects.bulk_create(
+        [PendingBookRating(book_id=book_id, marked_at=now) for book_id in set(book_ids)],
+        update_conflicts=True, unique_fields=['book_id'], update_fields=['marked_at'],
+    )
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import Review
+from .ratings import mark_books
+
+
+@receiver(pre_save, sender=Review)
+def remember_book_id(sender, instance, **kwargs):
+    # A review moved to another book changes both books' summaries
+    instance._previous_book_id = None
+    if instance.pk:
+        instance._previous_book_id = Review.objects.filter(pk=instance.pk).values_list(
+            'book_id', flat=True
+        ).first()
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def queue_rating_push(sender, instance, **kwargs):
+    book_ids = [instance.book_id]
+    previous = getattr(instance, '_previous_book_id', None)
+    if previous is not None and previous != instance.book_id:
+        book_ids.append(previous)
+    mark_books(*book_ids)
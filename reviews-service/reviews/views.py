@@ -1,14 +1,16 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.conf import settings
 from django.db.models import Avg, Count
 import requests
+from . import clients
+from .conditional import ConditionalGetMixin
 from .models import Review
+from .ratings import rating_summaries
 from .serializers import ReviewSerializer
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """ViewSet for Review CRUD operations"""
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
@@ -29,10 +31,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
             
             # Validate book exists (optional - for better error messages)
             try:
-                book_response = requests.get(
-                    f"{settings.BOOKS_SERVICE_URL}/api/books/{book_id}/",
-                    timeout=5
-                )
+                book_response = clients.books.get(f'/api/books/{book_id}/')
                 if book_response.status_code != 200:
                     return Response(
                         {'error': f'Book {book_id} not found'},
@@ -43,10 +42,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
             
             # Validate user exists (optional)
             try:
-                user_response = requests.get(
-                    f"{settings.USERS_SERVICE_URL}/api/users/{user_id}/",
-                    timeout=5
-                )
+                user_response = clients.users.get(f'/api/users/{user_id}/')
                 if user_response.status_code != 200:
                     return Response(
                         {'error': f'User {user_id} not found'},
@@ -65,18 +61,21 @@ class ReviewViewSet(viewsets.ModelViewSet):
         book_id = request.query_params.get('book_id')
         if book_id:
             reviews = Review.objects.filter(book_id=book_id)
-            serializer = self.get_serializer(reviews, many=True)
-            
-            # Calculate average rating
-            avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
-            total_reviews = reviews.count()
-            
-            return Response({
-                'book_id': book_id,
-                'average_rating': round(avg_rating, 2),
-                'total_reviews': total_reviews,
-                'reviews': serializer.data
-            })
+
+            def load():
+                serializer = self.get_serializer(reviews, many=True)
+
+                # Calculate average rating
+                avg_rating = reviews.aggregate(Avg('rating'))['rating__avg'] or 0
+                total_reviews = reviews.count()
+
+                return Response({
+                    'book_id': book_id,
+                    'average_rating': round(avg_rating, 2),
+                    'total_reviews': total_reviews,
+                    'reviews': serializer.data
+                })
+            return self.conditional_response(request, lambda: [reviews], load)
         return Response({'error': 'book_id parameter required'}, 
                        status=status.HTTP_400_BAD_REQUEST)
 
@@ -111,3 +110,19 @@ class ReviewViewSet(viewsets.ModelViewSet):
         return Response({'error': 'book_id parameter required'}, 
                        status=status.HTTP_400_BAD_REQUEST)
 
+
+    @action(detail=False, methods=['get'])
+    def rating_summaries(self, request):
+        """Per-book rating summaries, keyset-paged by book_id (used to reconcile books-service)"""
+        try:
+            after = int(request.query_params.get('after', 0))
+            limit = max(1, min(int(request.query_params.get('limit', 1000)), 5000))
+        except ValueError:
+            return Response({'error': 'after and limit must be integers'},
+                           status=status.HTTP_400_BAD_REQUEST)
+        book_ids = Review.objects.filter(book_id__gt=after).order_by('book_id').values_list(
+            'book_id', flat=True
+        ).distinct()[:limit]
+        return Response({
+            'results': rating_summaries(Review.objects.filter(book_id__in=list(book_ids)))
+        })
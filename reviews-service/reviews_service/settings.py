@@ -103,6 +103,19 @@ REST_FRAMEWORK = {
 USERS_SERVICE_URL = config('USERS_SERVICE_URL', default='http://users-service:8001')
 BOOKS_SERVICE_URL = config('BOOKS_SERVICE_URL', default='http://books-service:8002')
 
+# Sent with every rating summary push; books-service rejects pushes without it
+BOOK_RATINGS_PUSH_SECRET = config('BOOK_RATINGS_PUSH_SECRET', default='')
+
+# Inter-service HTTP client (service_client): keep-alive pools, GET retries, circuit breaker
+SERVICE_CLIENT = {
+    'TIMEOUT': config('SERVICE_CLIENT_TIMEOUT', default=5.0, cast=float),
+    'POOL_MAXSIZE': config('SERVICE_CLIENT_POOL_MAXSIZE', default=20, cast=int),
+    'RETRIES': config('SERVICE_CLIENT_RETRIES', default=2, cast=int),
+    'BACKOFF': config('SERVICE_CLIENT_BACKOFF', default=0.1, cast=float),
+    'FAILURE_THRESHOLD': config('SERVICE_CLIENT_FAILURE_THRESHOLD', default=5, cast=int),
+    'RESET_TIMEOUT': config('SERVICE_CLIENT_RESET_TIMEOUT', default=30.0, cast=float),
+}
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",